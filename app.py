@@ -1,12 +1,28 @@
 """Hops flask middleware example"""
-from flask import Flask
+from __future__ import annotations
+
+import math
+
+from flask import Flask, jsonify, request
 import ghhops_server as hs
-import rhino3dm
+
+import codec
+import kernels
+import panels
+import polar
+import polynomial
+import simulate
+import units
+from lazy import lazy_import
+from middleware import PhysicsHops
+
+#rhino3dm is only imported when a component first uses it
+rhino3dm = lazy_import("rhino3dm")
 
 
 # register hops app as middleware
 app = Flask(__name__)
-hops: hs.HopsFlask = hs.Hops(app)
+hops: PhysicsHops = PhysicsHops(app)
 
 
 # flask app can be used for other stuff drectly
@@ -15,6 +31,60 @@ def help():
     return "Welcome to Grashopper Hops for CPython!"
 
 
+#hit/miss counters of the server side solve cache
+@app.route("/cache")
+def cache():
+    return jsonify(hops.cache.stats())
+
+
+#requests, errors, latency percentiles (decode/compute/encode), items and bytes
+#of every component that has been solved since the server started
+@app.route("/metrics")
+def metrics():
+    stats = hops.metrics.snapshot()
+    stats["cache"] = hops.cache.stats()
+    stats["geometry_cache"] = codec.geometry_cache.stats()
+    stats["store"] = hops.store.stats()
+    stats["coalescing"] = hops.inflight.stats()
+    return jsonify(stats)
+
+
+#profile the next solves of a component, split into decode, compute and encode
+#POST /profile?uri=/pointat&count=5 arms it (count=0 disarms), GET lists what is
+#armed and the .pstats files written, read them with python -m pstats <file>
+@app.route("/profile", methods=["GET", "POST"])
+def profile():
+    if request.method == "POST":
+        uri = "/" + request.args.get("uri", "").strip("/")
+        if uri not in hops._components:
+            return jsonify({"errors": [f"Unknown Hops component url {uri}"]}), 404
+        hops.profiler.arm(uri, request.args.get("count", 1, type=int))
+    return jsonify(hops.profiler.stats())
+
+
+#every combination of input ranges of a component, computed on the server
+#POST {"pointer": "/boat_01", "inputs": {"S1": {"start": 0, "stop": 10, "count": 101},
+#"S3": [1, 2, 3]}} -> NDJSON lines: a header, then the outputs chunk by chunk
+@app.route("/sweep", methods=["POST"])
+def sweep():
+    try:
+        lines = hops.sweep(request.get_data())
+    except (ValueError, KeyError, TypeError, AttributeError) as bad_payload:
+        return jsonify({"errors": [f"Bad sweep payload: {bad_payload}"]}), 400
+    return app.response_class(lines, mimetype="application/x-ndjson")
+
+
+#several solves in one round trip, e.g. a whole Physics_001.gh chain
+#POST {"solves": [<solve payload>, ...]} -> {"results": [<solve response>, ...]}
+@app.route("/multisolve", methods=["POST"])
+def multisolve():
+    try:
+        result = hops.multisolve(request.get_data())
+    except (ValueError, KeyError, TypeError, AttributeError) as bad_payload:
+        return jsonify({"errors": [f"Bad multisolve payload: {bad_payload}"]}), 400
+    return app.response_class(result, mimetype="application/json")
+
+
 
 @hops.component(
     "/binmult",
@@ -59,6 +129,10 @@ def subtract(a: float, b: float):
     return a - b
 
 
+#process=True solves the rhino3dm geometry components in a pool of worker processes
+#pointat_batch evaluates one curve at a whole tree of t, decoding the curve once
+#(and not at all while the same curve is still in the geometry cache)
+#so they spread over all cores and do not block the number components
 @hops.component(
     "/pointat",
     name="PointAt",
@@ -69,7 +143,9 @@ def subtract(a: float, b: float):
         hs.HopsCurve("Curve", "C", "Curve to evaluate"),
         hs.HopsNumber("t", "t", "Parameter on Curve to evaluate")
     ],
-    outputs=[hs.HopsPoint("P", "P", "Point on curve at t")]
+    outputs=[hs.HopsPoint("P", "P", "Point on curve at t")],
+    batch=kernels.curve_points,
+    process=True,
 )
 def pointat(curve: rhino3dm.Curve, t=0.0):
     return curve.PointAt(t)
@@ -86,7 +162,8 @@ def pointat(curve: rhino3dm.Curve, t=0.0):
         hs.HopsPoint("Corner C", "C", "Third corner"),
         hs.HopsPoint("Corner D", "D", "Fourth corner")
     ],
-    outputs=[hs.HopsSurface("Surface", "S", "Resulting surface")]
+    outputs=[hs.HopsSurface("Surface", "S", "Resulting surface")],
+    process=True,
 )
 def ruled_surface(a: rhino3dm.Point3d,
                 b: rhino3dm.Point3d,
@@ -96,6 +173,50 @@ def ruled_surface(a: rhino3dm.Point3d,
     edge2 = rhino3dm.LineCurve(c, d)
     return rhino3dm.NurbsSurface.CreateRuledSurface(edge1, edge2)
 
+
+#panelize a whole facade in one call instead of one srf4pt call per panel
+#Points is a grid given row by row with Columns points per row,
+#or any points with Quads holding the A B C D corner indices of each panel
+#the surfaces are streamed back in chunks while they are made
+@hops.component(
+    "/srf4pt_grid",
+    name="4Point Surface Grid",
+    nickname="Srf4PtGrid",
+    description="Create a ruled surface for every panel of a point grid",
+    inputs=[
+        hs.HopsPoint("Points", "P", "Grid points, row by row", hs.HopsParamAccess.LIST),
+        hs.HopsInteger("Columns", "C", "Points per grid row"),
+        hs.HopsInteger("Quads", "Q", "Corner indices A B C D of each panel (instead of a grid)",
+                       hs.HopsParamAccess.LIST, optional=True),
+    ],
+    outputs=[hs.HopsSurface("Surfaces", "S", "Panel surfaces", hs.HopsParamAccess.LIST)],
+    arrays=True,
+    cache=False,
+)
+def srf4pt_grid(points, columns=0, quads=()):
+    quads = panels.panel_quads(len(points), columns[0], quads)
+    return panels.ruled_surfaces(points, quads)
+
+
+#the same panels as one light quad mesh, without building any NURBS
+@hops.component(
+    "/srf4pt_mesh",
+    name="4Point Mesh Grid",
+    nickname="Msh4PtGrid",
+    description="Create a quad mesh with a face for every panel of a point grid",
+    inputs=[
+        hs.HopsPoint("Points", "P", "Grid points, row by row", hs.HopsParamAccess.LIST),
+        hs.HopsInteger("Columns", "C", "Points per grid row"),
+        hs.HopsInteger("Quads", "Q", "Corner indices A B C D of each panel (instead of a grid)",
+                       hs.HopsParamAccess.LIST, optional=True),
+    ],
+    outputs=[hs.HopsMesh("Mesh", "M", "Panel mesh")],
+    arrays=True,
+)
+def srf4pt_mesh(points, columns=0, quads=()):
+    quads = panels.panel_quads(len(points), columns[0], quads)
+    return [panels.quad_mesh(points, quads)]
+
 """
 ██████╗ ██╗  ██╗██╗   ██╗███████╗██╗ ██████╗███████╗
 ██╔══██╗██║  ██║╚██╗ ██╔╝██╔════╝██║██╔════╝██╔════╝
@@ -119,12 +240,13 @@ def ruled_surface(a: rhino3dm.Point3d,
 #Average Speed(v) is a scalar quantity that refers to "how fast an object is moving."
 #equation for average speed is v = d/t
 #example
-l = 5 #meters
-t = 2 #seconds
-v = l/t #meters per second
-print(v)
+#l = 5 #meters
+#t = 2 #seconds
+#v = l/t = 2.5 #meters per second
 
 #write into @hops format
+#batch=True also registers /average_speed_batch, which takes whole data trees
+#and solves them in one NumPy call (d / t works on arrays as it is)
 @hops.component(
     "/average_speed",
     name="Average Speed",
@@ -134,7 +256,8 @@ print(v)
         hs.HopsNumber("Distance", "D", "Distance traveled"),
         hs.HopsNumber("Time", "T", "Time taken"),
     ],
-    outputs=[hs.HopsNumber("Speed", "S", "Average speed")]
+    outputs=[hs.HopsNumber("Speed", "S", "Average speed")],
+    batch=True,
 )
 def average_speed(d: float, t: float):
     return d / t
@@ -147,8 +270,8 @@ def average_speed(d: float, t: float):
 #equation is v = lim (t->0) (d/t) or v = d/t
 #this introduces the concept of a limit, calculus, and derivatives
 #example of instantaneous speed in an equation
-v = 3*t**2 + 2*t + 1
-print(v)
+#v = 3*t**2 + 2*t + 1
+#at t = 2 seconds, v = 17 meters per second
 
 #write into @hops format
 @hops.component(
@@ -159,7 +282,8 @@ print(v)
     inputs=[
         hs.HopsNumber("Time", "T", "Time taken"),
     ],
-    outputs=[hs.HopsNumber("Speed", "S", "Instantaneous speed")]
+    outputs=[hs.HopsNumber("Speed", "S", "Instantaneous speed")],
+    batch=True,
 )
 def instantaneous_speed(t: float):
     return 3*t**2 + 2*t + 1
@@ -179,10 +303,9 @@ def instantaneous_speed(t: float):
 #Displacement (d) is a vector quantity that refers to "how far out of place an object is"; it is the object's overall change in position.
 #equation for displacement is d = xf - xi
 #example
-xi = 5 #meters
-xf = 10 #meters
-d = xf - xi #meters
-print(d)
+#xi = 5 #meters
+#xf = 10 #meters
+#d = xf - xi = 5 #meters
 
 #write into @hops format
 @hops.component(
@@ -194,12 +317,15 @@ print(d)
         hs.HopsNumber("Initial Position", "Xi", "Initial position"),
         hs.HopsNumber("Final Position", "Xf", "Final position"),
     ],
-    outputs=[hs.HopsNumber("Displacement", "D", "Displacement")]
+    outputs=[hs.HopsNumber("Displacement", "D", "Displacement")],
+    batch=True,
 )
 def displacement(xi: float, xf: float):
     return xf - xi
 
 #create an example of a vector quantity from 2 3D points in the @hops format
+#the _batch twins of the point/vector components run the kernels in kernels.py
+#on whole point lists (Nx3 arrays) instead of one rhino3dm.Vector3d at a time
 @hops.component(
     "/vector",
     name="Vector",
@@ -209,7 +335,8 @@ def displacement(xi: float, xf: float):
         hs.HopsPoint("Point A", "A", "First point"),
         hs.HopsPoint("Point B", "B", "Second point"),
     ],
-    outputs=[hs.HopsVector("Vector", "V", "Resulting vector")]
+    outputs=[hs.HopsVector("Vector", "V", "Resulting vector")],
+    batch=kernels.vector,
 )
 def vector(a: rhino3dm.Point3d, b: rhino3dm.Point3d):
     return rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
@@ -218,12 +345,11 @@ def vector(a: rhino3dm.Point3d, b: rhino3dm.Point3d):
 #equation for velocity is v = d/t
 #equartion for average velocity is v = (xf - xi)/(tf - ti)
 #example
-xi = 5 #meters
-xf = 10 #meters
-ti = 0 #seconds
-tf = 2 #seconds
-v = (xf - xi)/(tf - ti) #meters per second
-print(v)
+#xi = 5 #meters
+#xf = 10 #meters
+#ti = 0 #seconds
+#tf = 2 #seconds
+#v = (xf - xi)/(tf - ti) = 2.5 #meters per second
 
 #write into @hops format
 @hops.component(
@@ -237,7 +363,8 @@ print(v)
         hs.HopsNumber("Initial Time", "Ti", "Initial time"),
         hs.HopsNumber("Final Time", "Tf", "Final time"),
     ],
-    outputs=[hs.HopsNumber("Velocity", "V", "Average velocity")]
+    outputs=[hs.HopsNumber("Velocity", "V", "Average velocity")],
+    batch=True,
 )
 def average_velocity(xi: float, xf: float, ti: float, tf: float):
     return (xf - xi)/(tf - ti)
@@ -246,8 +373,8 @@ def average_velocity(xi: float, xf: float, ti: float, tf: float):
 #equation for instantaneous velocity is v = lim (t->0) (d/t) or v = d/t
 #this introduces the concept of a limit, calculus, and derivatives
 #example of instantaneous velocity in an equation
-v = 3*t**2 + 2*t + 1
-print(v)
+#v = 3*t**2 + 2*t + 1
+#at t = 2 seconds, v = 17 meters per second
 
 #write into @hops format
 @hops.component(
@@ -263,6 +390,117 @@ print(v)
 def instantaneous_velocity(t: float):
     return 3*t**2 + 2*t + 1
 
+#the same kind of motion for a whole list of times in one call:
+#position, velocity (first derivative), acceleration (second derivative)
+#and the integral from 0, of a polynomial given by its coefficients
+#constant term first, so 3*t**2 + 2*t + 1 is 1, 2, 3
+
+#write into @hops format
+@hops.component(
+    "/polynomial_01",
+    name="Polynomial",
+    nickname="Poly",
+    description="Evaluate a polynomial, its derivatives and its integral",
+    inputs=[
+        hs.HopsNumber("Coefficients", "C", "Coefficients, constant term first",
+                      hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Time", "T", "Times to evaluate at", hs.HopsParamAccess.LIST),
+    ],
+    outputs=[
+        hs.HopsNumber("Value", "X", "Value at each time", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Derivative", "V", "First derivative at each time", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Second Derivative", "A", "Second derivative at each time",
+                      hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Integral", "I", "Integral from 0 to each time", hs.HopsParamAccess.LIST),
+    ],
+    arrays=True,
+)
+def polynomial_01(coefficients, t):
+    return polynomial.evaluate_polynomial(coefficients, t)
+
+
+#the same for any expression of t, e.g. 3*t**2 + 2*t + 1 or 4.9*t**2 + sin(t)
+#derivatives are numerical, the integral uses Gauss-Legendre quadrature
+
+#write into @hops format
+@hops.component(
+    "/expression_01",
+    name="Expression",
+    nickname="Expr",
+    description="Evaluate an expression of t, its derivatives and its integral",
+    inputs=[
+        hs.HopsString("Expression", "E", "Expression of t"),
+        hs.HopsNumber("Time", "T", "Times to evaluate at", hs.HopsParamAccess.LIST),
+    ],
+    outputs=[
+        hs.HopsNumber("Value", "X", "Value at each time", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Derivative", "V", "First derivative at each time", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Second Derivative", "A", "Second derivative at each time",
+                      hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Integral", "I", "Integral from 0 to each time", hs.HopsParamAccess.LIST),
+    ],
+    arrays=True,
+)
+def expression_01(expression, t):
+    return polynomial.evaluate_expression(expression[0], t)
+
+#when there is no closed form (air drag), step the motion through time instead
+#a = g + F/m - (k/m)*|v|*v
+#every projectile is integrated at once, over Steps steps of Time Step seconds
+#Method is euler, semi-implicit or rk4 (most accurate)
+#the trajectories are sampled Samples times, as polylines and as a point tree
+#(one branch per projectile), set Polylines to false to only get the points
+
+#write into @hops format
+@hops.component(
+    "/projectiles_01",
+    name="Projectiles",
+    nickname="Proj",
+    description="Simulate projectiles with gravity, drag and a constant force",
+    inputs=[
+        hs.HopsPoint("Positions", "P", "Start positions", hs.HopsParamAccess.LIST),
+        hs.HopsVector("Velocities", "V", "Start velocities", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("Time Step", "Dt", "Seconds per step"),
+        hs.HopsInteger("Steps", "N", "Number of steps"),
+        hs.HopsNumber("Drag", "K", "Quadratic drag coefficient"),
+        hs.HopsNumber("Mass", "M", "Mass of each projectile"),
+        hs.HopsNumber("Gravity", "G", "Gravity along -Z"),
+        hs.HopsVector("Force", "F", "Constant force on the projectiles",
+                      hs.HopsParamAccess.LIST, optional=True),
+        hs.HopsString("Method", "I", "euler, semi-implicit or rk4"),
+        hs.HopsInteger("Samples", "S", "Samples along each trajectory"),
+        hs.HopsBoolean("Polylines", "L", "Also return the trajectories as polylines"),
+    ],
+    outputs=[
+        hs.HopsCurve("Trajectories", "T", "Trajectory polylines", hs.HopsParamAccess.LIST),
+        hs.HopsPoint("Points", "Pts", "Trajectory points, a branch per projectile",
+                     hs.HopsParamAccess.TREE),
+        hs.HopsPoint("End Positions", "Pe", "Final positions", hs.HopsParamAccess.LIST),
+        hs.HopsVector("End Velocities", "Ve", "Final velocities", hs.HopsParamAccess.LIST),
+    ],
+    arrays=True,
+)
+def projectiles_01(positions, velocities, dt=0.01, steps=100, drag=0.0, mass=1.0,
+                   gravity=9.81, force=(), method="semi-implicit", samples=50,
+                   polylines=True):
+    count = max(len(positions), len(velocities))
+    particles = simulate.Particles(
+        codec.broadcast(positions, count),
+        codec.broadcast(velocities, count),
+        gravity=gravity[0],
+        drag=drag[0],
+        mass=mass[0],
+        force=codec.broadcast(force, count) if len(force) else None,
+    )
+    trajectories = particles.run(steps[0], dt[0], method[0], samples[0])
+    points = codec.Tree(
+        ["{%d}" % i for i in range(count)],
+        [trajectories.shape[1]] * count,
+        trajectories.reshape(-1, 3),
+    )
+    curves = simulate.polylines(trajectories) if polylines[0] else []
+    return curves, points, particles.position, particles.velocity
+
 #the addition of vectors is called vector addition
 #the result of vector addition is called the resultant
 #the resultant is the sum of two or more vectors
@@ -282,7 +520,8 @@ def instantaneous_velocity(t: float):
         hs.HopsVector("Vector1", "V1", "First vector"),
         hs.HopsVector("Vector2", "V2", "Second vector"),
         hs.HopsVector("Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.vector_addition,
 )
 def vector_addition_02(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d):
     vector1 = rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
@@ -315,7 +554,8 @@ def vector_addition_02(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Poi
         hs.HopsVector("Vector1", "V1", "First vector"),
         hs.HopsVector("Vector2", "V2", "Second vector"),
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.tip_to_tail,
 )
 def tip_to_tail_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d):
     vector1 = rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
@@ -340,9 +580,10 @@ def tip_to_tail_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d
         hs.HopsVector("Vector2", "V2", "Second vector"),
         hs.HopsVector("Vector3", "V3", "Third vector"),
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.tip_to_tail,
 )
-def tip_to_tail_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d, d: rhino3dm.Point3d):
+def tip_to_tail_02(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d, d: rhino3dm.Point3d):
     vector1 = rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
     vector2 = rhino3dm.Vector3d(c.X - b.X, c.Y - b.Y, c.Z - b.Z)
     vector3 = rhino3dm.Vector3d(d.X - c.X, d.Y - c.Y, d.Z - c.Z)
@@ -370,7 +611,8 @@ def tip_to_tail_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d
         hs.HopsVector("Vector1", "V1", "First vector"),
         hs.HopsVector("Vector2", "V2", "Second vector"),
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.parallelogram,
 )
 def parallelogram_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d):
     vector1 = rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
@@ -399,7 +641,8 @@ def parallelogram_01(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point
         hs.HopsVector("Vector1", "V1", "First vector"),
         hs.HopsVector("Vector2", "V2", "Second vector"),
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.vector_subtraction,
 )
 def vector_subtraction_03(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.Point3d):
     vector1 = rhino3dm.Vector3d(b.X - a.X, b.Y - a.Y, b.Z - a.Z)
@@ -428,7 +671,8 @@ def vector_subtraction_03(a: rhino3dm.Point3d, b: rhino3dm.Point3d, c: rhino3dm.
         hs.HopsNumber("Sine", "S", "Sine of angle"),
         hs.HopsNumber("Cosine", "C", "Cosine of angle"),
         hs.HopsNumber("Tangent", "T", "Tangent of angle")
-        ]
+        ],
+    batch=True,
 )
 def trigonometric_functions_04(a: float, o: float, h: float):
     s = o/h
@@ -459,12 +703,12 @@ def trigonometric_functions_04(a: float, o: float, h: float):
     outputs=[
         hs.HopsNumber("x component", "X", "X component of vector"),
         hs.HopsNumber("y component", "Y", "Y component of vector")
-        ]
+        ],
+    batch=True,
 )   
 def vector_components_03(r: rhino3dm.Vector3d, l: float, a: float):
-    import math
-    Rx = l * math.cos(a)
-    Ry = l * math.sin(a)
+    #Rx = l*cos(a), Ry = l*sin(a), for one angle or a whole list of them
+    Rx, Ry = polar.to_cartesian(l, a)
     return Rx, Ry
 
 #Component Method of Vector Addition
@@ -494,7 +738,8 @@ def vector_components_03(r: rhino3dm.Vector3d, l: float, a: float):
     ],
     outputs=[
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.vector_sum,
 )
 def component_method_08(v1: rhino3dm.Vector3d, v2: rhino3dm.Vector3d, v3: rhino3dm.Vector3d):
     Rx = v1.X + v2.X + v3.X
@@ -515,17 +760,45 @@ def component_method_08(v1: rhino3dm.Vector3d, v2: rhino3dm.Vector3d, v3: rhino3
     ],
     outputs=[
         hs.HopsVector("Resultant Vector", "V", "Resulting vector")
-        ]
+        ],
+    batch=kernels.component_method,
 )
 def component_method_09(v1: rhino3dm.Vector3d, v2: rhino3dm.Vector3d, v3: rhino3dm.Vector3d):
-    import math
     Rx = v1.X + v2.X + v3.X
     Ry = v1.Y + v2.Y + v3.Y
     Rz = v1.Z + v2.Z + v3.Z
     R = math.sqrt(Rx**2 + Ry**2 + Rz**2)
-    theta = math.atan(Ry/Rx)
+    #atan2 instead of atan(Ry/Rx), right in every quadrant and at Rx = 0
+    _, theta = polar.to_polar(Rx, Ry)
     return rhino3dm.Vector3d(Rx, Ry, Rz), R, theta
     
+#any number of vectors: the resultant of every branch of a data tree
+#(a flat list is one branch), so thousands of forces need one call
+#the angle comes from atan2, so it is right in all four quadrants
+
+#write into @hops format
+@hops.component(
+    "/resultant_01",
+    name="Resultant",
+    nickname="Res",
+    description="Add any number of vectors, per branch of a data tree",
+    inputs=[
+        hs.HopsVector("Vectors", "V", "Vectors to add, a resultant per branch",
+                      hs.HopsParamAccess.TREE)
+    ],
+    outputs=[
+        hs.HopsVector("Resultant Vector", "V", "Resultant of each branch",
+                      hs.HopsParamAccess.TREE),
+        hs.HopsNumber("magnitude", "M", "Magnitude of each resultant", hs.HopsParamAccess.TREE),
+        hs.HopsNumber("angle", "A", "Angle of each resultant from +x, in radians",
+                      hs.HopsParamAccess.TREE)
+        ],
+    arrays=True,
+)
+def resultant_01(vectors):
+    returned = kernels.resultant(vectors.data, vectors.counts)
+    return tuple(codec.per_branch(vectors, value) for value in returned)
+
 #unit vectors
 #unit vectors are vectors with a magnitude of 1
 #example
@@ -545,16 +818,50 @@ def component_method_09(v1: rhino3dm.Vector3d, v2: rhino3dm.Vector3d, v3: rhino3
     ],
     outputs=[
         hs.HopsVector("unit vector", "U", "Unit vector")
-        ]
+        ],
+    batch=kernels.unit_vector,
 )
 def unit_vectors(v: rhino3dm.Vector3d):
-    import math
     R = math.sqrt(v.X**2 + v.Y**2 + v.Z**2)
     Rx = v.X/R
     Ry = v.Y/R
     Rz = v.Z/R
     return rhino3dm.Vector3d(Rx, Ry, Rz)
 
+#pipelines chain components on the server, so Grasshopper makes one call
+#and the vectors in between are never encoded. the three vectors do not
+#depend on each other and are solved at the same time
+#example
+#A->B, B->C, C->D are added with the component method
+#and the resultant is turned into a unit vector
+
+#write into @hops format
+hops.pipeline(
+    "/resultant_direction_01",
+    name="Resultant Direction",
+    nickname="ResDir",
+    description="Unit vector of the resultant of the path A->B->C->D",
+    inputs=[
+        hs.HopsPoint("Point A", "A", "First point"),
+        hs.HopsPoint("Point B", "B", "Second point"),
+        hs.HopsPoint("Point C", "C", "Third point"),
+        hs.HopsPoint("Point D", "D", "Fourth point")
+    ],
+    outputs=[
+        hs.HopsVector("unit vector", "U", "Unit vector of the resultant")
+        ],
+    steps={
+        "ab": ("/vector", {"Point A": "A", "Point B": "B"}),
+        "bc": ("/vector", {"Point A": "B", "Point B": "C"}),
+        "cd": ("/vector", {"Point A": "C", "Point B": "D"}),
+        "sum": ("/component_method_09", {
+            "Vector1": "ab.Vector", "Vector2": "bc.Vector", "Vector3": "cd.Vector",
+        }),
+        "unit": ("/unit_vectors", {"vector": "sum.Resultant Vector"}),
+    },
+    returns=["unit.unit vector"],
+)
+
 #Mathematical Operations with Units
 #the unit terms must be carried along with the numerical values
 #and must undergo the same mathematical operations as the numerical values
@@ -567,21 +874,49 @@ def unit_vectors(v: rhino3dm.Vector3d):
 #(5 m)/(2 s) = 2.5 m/s
 
 #write into @hops format
-@hops.component(
+#one line formulas are registered with hops.formula instead of a function,
+#they are compiled once into a numpy kernel that also solves the _batch twin
+#with input_units and output_units the formula is written in SI units and
+#checked to give the output units, the conversions are done by the kernel
+hops.formula(
     "/mathematical_operations_with_units",
+    formulas="S = L / T",
     name="Mathematical Operations",
     nickname="MathOp",
     description="Calculate mathematical operations with units",
     inputs=[
-        hs.HopsNumber("length", "L", "Length"),
-        hs.HopsNumber("time", "T", "Time")
+        hs.HopsNumber("length", "L", "Length in m"),
+        hs.HopsNumber("time", "T", "Time in s")
     ],
     outputs=[
-        hs.HopsNumber("speed", "S", "Speed")
-        ]
+        hs.HopsNumber("speed", "S", "Speed in m/s")
+        ],
+    input_units={"L": "m", "T": "s"},
+    output_units={"S": "m/s"},
 )
-def mathematical_operations_with_units(l: float, t: float):
-    return l/t
+
+#any quantity from one unit to another, e.g. mi/h to m/s or lbf to N
+#metric and imperial units can be mixed, see units.py for the known units
+#a whole list is converted with one multiply
+
+#write into @hops format
+@hops.component(
+    "/convert_units_01",
+    name="Convert Units",
+    nickname="Units",
+    description="Convert values from one unit to another",
+    inputs=[
+        hs.HopsNumber("Values", "V", "Values to convert", hs.HopsParamAccess.LIST),
+        hs.HopsString("From", "F", "Unit of the values, e.g. km/h"),
+        hs.HopsString("To", "T", "Unit to convert to, e.g. m/s"),
+    ],
+    outputs=[
+        hs.HopsNumber("Values", "V", "Converted values", hs.HopsParamAccess.LIST),
+    ],
+    arrays=True,
+)
+def convert_units_01(values, from_unit, to_unit):
+    return units.convert(values, from_unit[0], to_unit[0])
 
 #Problem solving Guide
 #1. read the problem carefully
@@ -599,56 +934,56 @@ def mathematical_operations_with_units(l: float, t: float):
 #A toy train moves along a winding track at an average speed of 2.5 m/s.  
 #How far will it travel in 4.00 minutes? 
 
+#the defining equation for average speed is v = d/t
+#d is in meters
+#t is in seconds
+#convert minutes to seconds
+#1 minute = 60 seconds
 #write into @hops format
-@hops.component(
+hops.formula(
     "/toy_train_01",
+    formulas="D = S * T",
     name="Toy Train",
     nickname="ToyTrn",
     description="Calculate distance traveled by toy train",
     inputs=[
-        hs.HopsNumber("speed", "S", "Speed"),
-        hs.HopsNumber("time", "T", "Time")
+        hs.HopsNumber("speed", "S", "Speed in m/s"),
+        hs.HopsNumber("time", "T", "Time in minutes")
     ],
     outputs=[
-        hs.HopsNumber("distance", "D", "Distance")
-        ]
+        hs.HopsNumber("distance", "D", "Distance in m")
+        ],
+    input_units={"S": "m/s", "T": "min"},
+    output_units={"D": "m"},
 )
-def toy_train_01(s: float, t: float):
-    #the defining equation for average speed is v = d/t
-    #d is in meters
-    #t is in seconds
-    #convert minutes to seconds
-    #1 minute = 60 seconds
-    l = s * t * 60
-    return l
 
 #A student driving a car travels 10.0 km in 30.0 minutes. 
 #What is the student's average speed in m/s?
 
+#the defining equation for average speed is v = d/t
+#d is in kilometers
+#t is in minutes
+#convert kilometers to meters
+#1 kilometer = 1000 meters
+#convert minutes to seconds
+#1 minute = 60 seconds
 #write into @hops format
-@hops.component(
+hops.formula(
     "/student_car_01",
+    formulas="S = D / T",
     name="Student Car",
     nickname="StuCar",
     description="Calculate average speed of student driving car",   
     inputs=[
-        hs.HopsNumber("distance", "D", "Distance"),
-        hs.HopsNumber("time", "T", "Time")
+        hs.HopsNumber("distance", "D", "Distance in km"),
+        hs.HopsNumber("time", "T", "Time in minutes")
     ],
     outputs=[
-        hs.HopsNumber("speed", "S", "Speed")
-        ]
+        hs.HopsNumber("speed", "S", "Speed in m/s")
+        ],
+    input_units={"D": "km", "T": "min"},
+    output_units={"S": "m/s"},
 )
-def student_car_01(d: float, t: float):
-    #the defining equation for average speed is v = d/t
-    #d is in kilometers
-    #t is in minutes
-    #convert kilometers to meters
-    #1 kilometer = 1000 meters
-    #convert minutes to seconds
-    #1 minute = 60 seconds
-    v = (d * 1000)/(t * 60)
-    return v
 
 #Rollling along across the machine shop at a constant speed of S m/s,
 #a robot covers a distance of D m. 
@@ -666,7 +1001,8 @@ def student_car_01(d: float, t: float):
     ],
     outputs=[
         hs.HopsNumber("time", "T", "Time")
-        ]
+        ],
+    batch=True,
 )
 def robot_01(s: float, d: float):
     #the defining equation for average speed is v = d/t
@@ -677,29 +1013,29 @@ def robot_01(s: float, d: float):
 #Change the speed S cm/s to units of kilometers per year. 
 #Use 365 days in a year.
 
+#the defining equation for average speed is v = d/t
+#convert centimeters to kilometers
+#1 kilometer = 100000 centimeters
+#convert seconds into hours
+#convert hours into days
+#convert days into years
+#1 year = 365 days
 #write into @hops format
-@hops.component(
+hops.formula(
     "/speed_04",
+    formulas="S = S",
     name="Speed",
     nickname="Spd",
     description="Convert speed from cm/s to km/year",
     inputs=[
-        hs.HopsNumber("speed", "S", "Speed")
+        hs.HopsNumber("speed", "S", "Speed in cm/s")
     ],
     outputs=[
-        hs.HopsNumber("speed", "S", "Speed")
-        ]
+        hs.HopsNumber("speed", "S", "Speed in km/year")
+        ],
+    input_units={"S": "cm/s"},
+    output_units={"S": "km/year"},
 )
-def speed_04(s: float):
-    #the defining equation for average speed is v = d/t
-    #convert centimeters to kilometers
-    #1 kilometer = 100000 centimeters
-    #convert seconds into hours
-    #convert hours into days
-    #convert days into years
-    #1 year = 365 days
-    v = (s * 60 * 60 * 24 * 365)/100000
-    return v
 
 #A car travels along a road and its odometer readings are plotted
 #against time in a Fig. 2-1. See notes for Fig. 2-1.
@@ -739,9 +1075,11 @@ def car_01(d: float, t: float):
 #Determine the magnitude of the displacement of the brass eagle on top of the flagpole
 #with respect to the kids feet
 
+#the defining equation for displacement is d = xf - xi
 #write into @hops format
-@hops.component(
+hops.formula(
     "/flagpole_01",
+    formulas="D = sqrt(A**2 + O**2)",
     name="Flagpole",
     nickname="Flgpl",
     description="Calculate magnitude of displacement of brass eagle on top of flagpole",
@@ -753,18 +1091,21 @@ def car_01(d: float, t: float):
         hs.HopsNumber("displacement", "D", "Displacement")
         ]
 )
-def flagpole_01(a: float, o: float):
-    #the defining equation for displacement is d = xf - xi
-    import math
-    d = math.sqrt(a**2 + o**2)
-    return d
 
 #A runner makes one complete lap around a D m track in a time of T s.
 #What were the runner's (a) average speed and (b) average velocity?
 
+#Average speed is the distance traveled divided by the time taken
+#Average velocity is the displacement divided by the time taken
+#since the run ends at the starting point, the displacement is zero
+#Average speed = Average velocity = d/t = 0/t = 0
 #write into @hops format
-@hops.component(
+hops.formula(
     "/runner_01",
+    formulas=[
+        "S = D / T",
+        "V = 0 / T",
+    ],
     name="Runner",
     nickname="Run",
     description="Calculate average speed and average velocity of runner",
@@ -777,14 +1118,6 @@ def flagpole_01(a: float, o: float):
         hs.HopsNumber("velocity", "V", "Velocity")
         ]
 )
-def runner_01(d: float, t: float):
-    #Average speed is the distance traveled divided by the time taken
-    #Average velocity is the displacement divided by the time taken
-    #since the run ends at the starting point, the displacement is zero
-    #Average speed = Average velocity = d/t = 0/t = 0
-    s = d/t
-    v = 0/t
-    return s, v
 
 #Using the graphical method in Fig. 2-2 and Fig. 2-3,
 #find the resultant of the following pairs of vectors
@@ -807,16 +1140,46 @@ def runner_01(d: float, t: float):
         hs.HopsVector("Resultant Vector", "V", "Resulting vector"),
         hs.HopsNumber("magnitude", "M", "Magnitude of resulting vector"),
         hs.HopsNumber("angle", "A", "Angle of resulting vector")
-        ]
+        ],
+    batch=kernels.graphical_method,
 )
 def graphical_method_02(l1: float, a1: float, l2: float, a2: float):
-    import math
-    Rx = l1 * math.cos(a1) + l2 * math.cos(a2)
-    Ry = l1 * math.sin(a1) + l2 * math.sin(a2)
-    R = math.sqrt(Rx**2 + Ry**2)
-    theta = math.atan(Ry/Rx)
+    x1, y1 = polar.to_cartesian(l1, a1)
+    x2, y2 = polar.to_cartesian(l2, a2)
+    Rx = x1 + x2
+    Ry = y1 + y2
+    #the angle comes from atan2, right in every quadrant and at Rx = 0
+    R, theta = polar.to_polar(Rx, Ry)
     return rhino3dm.Vector3d(Rx, Ry, 0), R, theta
 
+#the same for any number of polar vectors (length, angle from +x)
+#one resultant per branch, Lengths and Angles need the same tree layout
+
+#write into @hops format
+@hops.component(
+    "/polar_resultant_01",
+    name="Polar Resultant",
+    nickname="PolRes",
+    description="Add any number of polar vectors, per branch of a data tree",
+    inputs=[
+        hs.HopsNumber("lengths", "L", "Lengths of the vectors", hs.HopsParamAccess.TREE),
+        hs.HopsNumber("angles", "A", "Angles of the vectors from +x",
+                      hs.HopsParamAccess.TREE),
+        hs.HopsBoolean("degrees", "D", "True for angles in degrees, false for radians")
+    ],
+    outputs=[
+        hs.HopsVector("Resultant Vector", "V", "Resultant of each branch",
+                      hs.HopsParamAccess.TREE),
+        hs.HopsNumber("magnitude", "M", "Magnitude of each resultant", hs.HopsParamAccess.TREE),
+        hs.HopsNumber("angle", "A", "Angle of each resultant from +x",
+                      hs.HopsParamAccess.TREE)
+        ],
+    arrays=True,
+)
+def polar_resultant_01(lengths, angles, degrees):
+    returned = kernels.polar_resultant(lengths.data, angles.data, lengths.counts, degrees[0])
+    return tuple(codec.per_branch(lengths, value) for value in returned)
+
 #Find the x- and y-components of a D meter displacement vector at 
 #an angle of A degrees counterclockwise from the +x axis
 
@@ -833,14 +1196,59 @@ def graphical_method_02(l1: float, a1: float, l2: float, a2: float):
     outputs=[
         hs.HopsNumber("x component", "X", "X component of vector"),
         hs.HopsNumber("y component", "Y", "Y component of vector")
-        ]
+        ],
+    batch=True,
 )
 def displacement_01(l: float, a: float):
-    import math
-    Rx = l * math.cos(a)
-    Ry = l * math.sin(a)
+    Rx, Ry = polar.to_cartesian(l, a)
     return Rx, Ry
 
+#whole lists of vectors between polar (length, angle from +x) and cartesian form
+#with the angles in degrees or radians, sin and cos are worked out once per angle
+
+#write into @hops format
+@hops.component(
+    "/polar_to_cartesian_01",
+    name="Polar to Cartesian",
+    nickname="Pol2Cart",
+    description="Convert vectors from length and angle to x and y components",
+    inputs=[
+        hs.HopsNumber("lengths", "L", "Lengths of the vectors", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("angles", "A", "Angles of the vectors from +x", hs.HopsParamAccess.LIST),
+        hs.HopsBoolean("degrees", "D", "True for angles in degrees, false for radians")
+    ],
+    outputs=[
+        hs.HopsNumber("x component", "X", "X components", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("y component", "Y", "Y components", hs.HopsParamAccess.LIST),
+        hs.HopsVector("vectors", "V", "Vectors in the XY plane", hs.HopsParamAccess.LIST)
+        ],
+    arrays=True,
+)
+def polar_to_cartesian_01(lengths, angles, degrees):
+    count = max(len(lengths), len(angles))
+    return kernels.polar_vectors(
+        codec.broadcast(lengths, count), codec.broadcast(angles, count), degrees[0]
+    )
+
+#write into @hops format
+@hops.component(
+    "/cartesian_to_polar_01",
+    name="Cartesian to Polar",
+    nickname="Cart2Pol",
+    description="Convert vectors to length and angle from +x in the XY plane",
+    inputs=[
+        hs.HopsVector("vectors", "V", "Vectors", hs.HopsParamAccess.LIST),
+        hs.HopsBoolean("degrees", "D", "True for angles in degrees, false for radians")
+    ],
+    outputs=[
+        hs.HopsNumber("lengths", "L", "Lengths in the XY plane", hs.HopsParamAccess.LIST),
+        hs.HopsNumber("angles", "A", "Angles from +x (atan2)", hs.HopsParamAccess.LIST)
+        ],
+    arrays=True,
+)
+def cartesian_to_polar_01(vectors, degrees):
+    return polar.to_polar(vectors[:, 0], vectors[:, 1], degrees[0])
+
 #where subtracting a vector is the same as adding the negative of the vector
 #we simply reverse the direction of the vector to be subtracted and add it to the first vector
 #the resultant is the vector drawn from the tail of the first vector to the head of the last vector
@@ -855,9 +1263,16 @@ def displacement_01(l: float, a: float):
 #how fast can the boat travel upstream?
 #How fast can it travel downstream?
 
+#the defining equation for average speed is v = d/t
+#the speed of the boat upstream is the speed of the boat in still water minus the speed of the river
+#the speed of the boat downstream is the speed of the boat in still water plus the speed of the river
 #write into @hops format
-@hops.component(
+hops.formula(
     "/boat_01",
+    formulas=[
+        "Su = S1 - S3",
+        "Sd = S1 + S3",
+    ],
     name="Boat",
     nickname="Boat",
     description="Calculate speed of boat upstream and downstream",
@@ -871,13 +1286,6 @@ def displacement_01(l: float, a: float):
         hs.HopsNumber("speed downstream", "Sd", "Speed of boat downstream")
         ]
 )
-def boat_01(s1: float, s2: float, s3: float):
-    #the defining equation for average speed is v = d/t
-    #the speed of the boat upstream is the speed of the boat in still water minus the speed of the river
-    #the speed of the boat downstream is the speed of the boat in still water plus the speed of the river
-    su = s1 - s3
-    sd = s1 + s3
-    return su, sd
 
 
 
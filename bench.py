@@ -0,0 +1,393 @@
+"""Offline benchmark of every Hops component
+
+Builds Hops /solve payloads for every registered component from its
+metadata and replays them, without Rhino or Grasshopper:
+
+    python bench.py                                  # in process, Flask test client
+    python bench.py --url http://127.0.0.1:5000      # against a running server
+    python bench.py --only vector --sizes 1,1000,100000 --output after.json
+    python bench.py --compare before.json --output after.json
+    python bench.py --only _batch --encoding float64      # compact block payloads
+    python bench.py --startup                        # import time of app.py
+
+Item access components get single values. Components with list or tree
+inputs (the _batch twins) get trees of each --sizes item count.
+Results (throughput and latency percentiles per endpoint and size) go to
+--output as JSON so runs can be diffed.
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import urllib.parse
+
+from metrics import percentile
+
+
+ITEM, LIST, TREE = "item", "list", "tree"
+
+# median time to import app.py in a fresh interpreter, checked by --startup
+STARTUP_TARGET_MS = 300.0
+
+# input types --encoding float64 sends as blocks
+BLOCK_TYPES = ("Number", "Point", "Vector")
+
+# payload values for Text inputs, which can not be made up at random
+TEXT_SAMPLES = {
+    ("/expression_01", "Expression"): ["3*t**2 + 2*t + 1", "4.9*t**2 + sin(t)"],
+    ("/projectiles_01", "Method"): ["euler", "semi-implicit", "rk4"],
+}
+
+# components whose Points must be a grid of Columns points per row
+GRID_COMPONENTS = ("/srf4pt_grid", "/srf4pt_mesh")
+
+
+def access(param):
+    """Access of a param from its Hops metadata"""
+    if param.get("AtMost") == -1:
+        return TREE
+    if param.get("AtMost", 1) > 1:
+        return LIST
+    return ITEM
+
+
+def _point(rnd):
+    return {"X": rnd.uniform(-100, 100), "Y": rnd.uniform(-100, 100), "Z": rnd.uniform(-100, 100)}
+
+
+def _curve(rnd):
+    import rhino3dm
+
+    points = [rhino3dm.Point3d(i * 10.0, rnd.uniform(-10, 10), 0.0) for i in range(4)]
+    return rhino3dm.Curve.CreateControlPointCurve(points, 3).Encode()
+
+
+def make_item(param, rnd, uri=""):
+    """One random Hops value item for a param"""
+    param_type = param["ParamType"]
+    if param_type == "Number":
+        # stay away from zero, most formulas divide by their inputs
+        return {"type": "System.Double", "data": repr(rnd.uniform(0.5, 10.0))}
+    if param_type == "Integer":
+        return {"type": "System.Int32", "data": str(rnd.randint(1, 10))}
+    if param_type == "Boolean":
+        return {"type": "System.Boolean", "data": "false"}
+    if param_type in ("Point", "Vector"):
+        result_type = "Rhino.Geometry.Point3d" if param_type == "Point" else "Rhino.Geometry.Vector3d"
+        return {"type": result_type, "data": json.dumps(_point(rnd))}
+    if param_type == "Curve":
+        return {"type": "Rhino.Geometry.Curve", "data": json.dumps(_curve(rnd))}
+    if param_type == "Text":
+        samples = TEXT_SAMPLES.get((uri, param["Name"]), ["1"])
+        return {"type": "System.String", "data": json.dumps(rnd.choice(samples))}
+    raise ValueError(f"No sample data for {param_type} inputs")
+
+
+def _block(param, branch):
+    # the standard items of a branch packed into one float64 block item
+    if param["ParamType"] == "Number":
+        values = [float(item["data"]) for item in branch]
+    else:
+        values = []
+        for item in branch:
+            point = json.loads(item["data"])
+            values.extend((point["X"], point["Y"], point["Z"]))
+    data = base64.b64encode(struct.pack("<%dd" % len(values), *values))
+    return {"type": "Float64Block", "data": data.decode("ascii")}
+
+
+def _grid_values(items, rnd):
+    # Points on a grid of about items points, row by row, and its Columns
+    columns = max(2, round(items ** 0.5))
+    rows = max(2, items // columns)
+    points = [
+        {"X": column * 10.0, "Y": row * 10.0, "Z": rnd.uniform(-5, 5)}
+        for row in range(rows)
+        for column in range(columns)
+    ]
+    return [
+        {
+            "ParamName": "Points",
+            "InnerTree": {"{0}": [
+                {"type": "Rhino.Geometry.Point3d", "data": json.dumps(point)} for point in points
+            ]},
+        },
+        {
+            "ParamName": "Columns",
+            "InnerTree": {"{0}": [{"type": "System.Int32", "data": str(columns)}]},
+        },
+        {"ParamName": "Quads", "InnerTree": {}},
+    ]
+
+
+def make_payload(component, items=1, branch_size=10, seed=0, encoding=None):
+    """A /solve payload for a component with items values per input
+
+    encoding="float64" packs number, point and vector list/tree inputs into
+    base64 blocks and asks for the outputs the same way
+    """
+    rnd = random.Random(seed)
+    uri = component["Uri"]
+    # random points are no grid, so every solve of these would fail
+    values = _grid_values(items, rnd) if uri in GRID_COMPONENTS else []
+    inputs = [] if uri in GRID_COMPONENTS else component["Inputs"]
+    for param in inputs:
+        if access(param) == ITEM or items == 1:
+            inner_tree = {"{0}": [make_item(param, rnd, uri)]}
+        elif access(param) == LIST:
+            inner_tree = {"{0}": [make_item(param, rnd, uri) for _ in range(items)]}
+        else:
+            inner_tree = {}
+            for start in range(0, items, branch_size):
+                count = min(branch_size, items - start)
+                inner_tree["{0;%d}" % (start // branch_size)] = [
+                    make_item(param, rnd, uri) for _ in range(count)
+                ]
+        if encoding and access(param) != ITEM and param["ParamType"] in BLOCK_TYPES:
+            inner_tree = {path: [_block(param, branch)] for path, branch in inner_tree.items()}
+        values.append({"ParamName": param["Name"], "InnerTree": inner_tree})
+    payload = {
+        "absolutetolerance": 0.001,
+        "angletolerance": 1.0,
+        "modelunits": "Millimeters",
+        "algo": None,
+        "pointer": uri,
+        "cachesolve": False,
+        "recursionlevel": 0,
+        "values": values,
+        "warnings": [],
+        "errors": [],
+    }
+    if encoding:
+        payload["encoding"] = encoding
+    return payload
+
+
+def takes_lists(component):
+    return any(access(param) != ITEM for param in component["Inputs"])
+
+
+class TestClientDriver:
+    """Solves through the Flask test client of app.py, in this process"""
+
+    def __init__(self):
+        from app import app
+
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.data
+
+    def post(self, path, body):
+        response = self.client.post(path, data=body, content_type="application/json")
+        return response.status_code, response.data
+
+
+class HttpDriver:
+    """Solves against a running server over one keep-alive connection"""
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=600)
+
+    def _request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # reconnect once when the server dropped the connection
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=600)
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def get(self, path):
+        return self._request("GET", path)
+
+    def post(self, path, body):
+        return self._request("POST", path, body)
+
+
+def components(driver):
+    """Metadata of every registered component"""
+    status, body = driver.get("/")
+    if status != 200:
+        raise RuntimeError(f"GET / failed with {status}")
+    # every component is listed once per uri
+    return list({comp["Uri"]: comp for comp in json.loads(body)}.values())
+
+
+def bench_payload(driver, body, seconds, min_requests):
+    """Post body until seconds have passed, returns latencies and error count"""
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    while len(latencies) < min_requests or time.perf_counter() - started < seconds:
+        begin = time.perf_counter()
+        status, _ = driver.post("/solve", body)
+        latencies.append(time.perf_counter() - begin)
+        errors += 0 if status == 200 else 1
+    return latencies, errors
+
+
+def summarize(uri, items, latencies, errors, payload_bytes):
+    ordered = sorted(latencies)
+    elapsed = sum(latencies)
+    return {
+        "endpoint": uri,
+        "items": items,
+        "payload_bytes": payload_bytes,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "items_per_second": len(latencies) * items / elapsed if elapsed else 0.0,
+        "mean_ms": elapsed / len(latencies) * 1000.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000.0,
+        "p95_ms": percentile(ordered, 0.95) * 1000.0,
+        "p99_ms": percentile(ordered, 0.99) * 1000.0,
+    }
+
+
+def compare(before, after, threshold):
+    """Print p50 changes between two result files, returns regression count"""
+    old = {(r["endpoint"], r["items"]): r for r in before["results"]}
+    regressions = 0
+    for result in after["results"]:
+        previous = old.get((result["endpoint"], result["items"]))
+        if not previous or not previous["p50_ms"]:
+            continue
+        ratio = result["p50_ms"] / previous["p50_ms"]
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(
+            f"{result['endpoint']:<40} {result['items']:>8} "
+            f"{previous['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f} ms  x{ratio:.2f}{flag}"
+        )
+    return regressions
+
+
+def startup_time(runs=5):
+    """Median seconds for a fresh python to import app.py"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(runs):
+        begin = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app"], cwd=here, check=True)
+        times.append(time.perf_counter() - begin)
+    return statistics.median(times)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="server to benchmark, default: app.py in process")
+    parser.add_argument(
+        "--startup", action="store_true",
+        help=f"only time importing app.py, fails above {STARTUP_TARGET_MS:.0f} ms",
+    )
+    parser.add_argument("--only", help="regex, only endpoints whose uri matches")
+    parser.add_argument(
+        "--sizes", default="1,100,10000",
+        help="item counts for components with list/tree inputs",
+    )
+    parser.add_argument("--branch-size", type=int, default=10, help="items per tree branch")
+    parser.add_argument(
+        "--encoding", choices=["float64"],
+        help="send list/tree inputs as compact blocks and ask for blocks back",
+    )
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per endpoint and size")
+    parser.add_argument("--min-requests", type=int, default=5)
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="keep the server solve cache on (in process runs turn it off)",
+    )
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="p50 slowdown counted as a regression by --compare",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.startup:
+        elapsed_ms = startup_time() * 1000.0
+        print(f"import app: {elapsed_ms:.1f} ms (target {STARTUP_TARGET_MS:.0f} ms)")
+        if elapsed_ms > STARTUP_TARGET_MS:
+            sys.exit(1)
+        return
+
+    if args.url:
+        driver = HttpDriver(args.url)
+    else:
+        if not args.cache:
+            # repeated identical payloads would only measure cache hits
+            os.environ["HOPS_CACHE_SIZE"] = "0"
+        driver = TestClientDriver()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = []
+    for component in sorted(components(driver), key=lambda comp: comp["Uri"]):
+        uri = component["Uri"]
+        if args.only and not re.search(args.only, uri):
+            continue
+        for items in sizes if takes_lists(component) else [1]:
+            try:
+                payload = make_payload(component, items, args.branch_size, encoding=args.encoding)
+            except ValueError as skip:
+                print(f"{uri:<40} skipped: {skip}")
+                break
+            body = json.dumps(payload)
+            # warm up caches and lazy imports before timing
+            driver.post("/solve", body)
+            latencies, errors = bench_payload(driver, body, args.seconds, args.min_requests)
+            result = summarize(uri, items, latencies, errors, len(body))
+            results.append(result)
+            print(
+                f"{uri:<40} {items:>8} items {result['requests_per_second']:>10.1f} req/s "
+                f"p50 {result['p50_ms']:>9.3f} p95 {result['p95_ms']:>9.3f} "
+                f"p99 {result['p99_ms']:>9.3f} ms  errors {errors}"
+            )
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": args.url or "in-process",
+            "cache": None if args.url else args.cache,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seconds": args.seconds,
+            "encoding": args.encoding,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as out_file:
+        json.dump(report, out_file, indent=1)
+    print(f"wrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as before_file:
+            before = json.load(before_file)
+        if compare(before, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""In-memory cache of solve results"""
+import ast
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def _local_imports(path):
+    # files of the modules next to path that its source imports
+    directory = os.path.dirname(path)
+    with open(path, "rb") as source:
+        tree = ast.parse(source.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+        elif (
+            isinstance(node, ast.Call)
+            and getattr(node.func, "id", None) == "lazy_import"
+            and node.args
+            and isinstance(node.args[0], ast.Constant)
+        ):
+            names.add(str(node.args[0].value).split(".")[0])
+    files = (os.path.join(directory, name + ".py") for name in sorted(names))
+    return [file for file in files if os.path.isfile(file)]
+
+
+@functools.lru_cache(maxsize=None)
+def modules_version(path):
+    """Hash of the source of the module at path and of every module next to
+    it that it imports, directly or through another one
+
+    component functions call helpers (kernels.py, codec.py, units.py...)
+    whose changes their own source does not show, so a deploy that changes
+    any module of the app gives every component a new version. scripts next
+    to it that the app does not import (bench.py, loadgen.py...) do not count
+    """
+    path = os.path.abspath(path)
+    files = {path}
+    todo = [path]
+    while todo:
+        for file in _local_imports(todo.pop()):
+            if file not in files:
+                files.add(file)
+                todo.append(file)
+    digest = hashlib.sha1()
+    for file in sorted(files):
+        with open(file, "rb") as source:
+            digest.update(os.path.basename(file).encode("utf-8"))
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def code_version(func):
+    """Hash of a component function's source and of the modules its module
+    imports, changes whenever the code does"""
+    try:
+        code = inspect.getsource(func)
+    except (OSError, TypeError):
+        # no source on disk, fall back to the compiled code
+        func_code = func.__code__
+        code = repr((func_code.co_code, func_code.co_consts, func_code.co_names))
+    module = sys.modules.get(func.__module__)
+    if module and getattr(module, "__file__", None):
+        code += modules_version(module.__file__)
+    return hashlib.sha1(code.encode("utf-8")).hexdigest()[:16]
+
+
+def input_hash(values):
+    """Canonical hash of the input "values" of a solve request"""
+    canonical = json.dumps(
+        sorted(values, key=lambda value: value["ParamName"]),
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+class SolveCache:
+    """Thread safe LRU cache with time to live
+
+    maxsize: number of results to keep, 0 turns the cache off
+    ttl: seconds a result stays valid, 0 keeps results until evicted
+    max_bytes: memory the results may take, the least recently used are
+               evicted past it and bigger results are not kept. 0 leaves
+               only maxsize, for results that are not strings
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0, max_bytes=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, result, size = item
+            if expires and expires < time.monotonic():
+                del self._items[key]
+                self.size_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        size = sys.getsizeof(result) if self.max_bytes else 0
+        if size > self.max_bytes > 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[2]
+            self._items[key] = (expires, result, size)
+            self.size_bytes += size
+            while len(self._items) > self.maxsize or (
+                self.max_bytes and self.size_bytes > self.max_bytes
+            ):
+                _, (_, _, evicted) = self._items.popitem(last=False)
+                self.size_bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """Counters for reporting"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
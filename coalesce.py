@@ -0,0 +1,71 @@
+"""Single-flight coalescing of identical concurrent solves"""
+import threading
+
+
+class _Flight:
+    # one call in progress and the callers waiting for it
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread safe: one call per key at a time
+
+    callers that ask for a key while its call is still running wait for
+    that call and share its result (or its exception) instead of
+    running their own. nothing is kept once the call is done
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._flights)
+
+    def do(self, key, func):
+        """func() for key, or the result of the same call already running
+
+        returns (result, shared), shared is True if another caller ran it
+        """
+        if not self.enabled:
+            return func(), False
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = func()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        """Counters for reporting"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
@@ -0,0 +1,338 @@
+"""Array codec for Hops data trees"""
+import base64
+import hashlib
+import inspect
+import json
+import os
+from collections import namedtuple
+from collections.abc import Iterator
+
+import ghhops_server as hs
+from ghhops_server import params as hparams
+
+from cache import SolveCache
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+# a decoded data tree
+# paths are the branch paths as Hops sends them, e.g. "{0;1}"
+# counts are the number of items in each branch
+# data holds the items of all branches back to back (1D numbers, Nx3 points/vectors)
+Tree = namedtuple("Tree", ["paths", "counts", "data"])
+
+NUMBER_PARAMS = (hs.HopsNumber,)
+INTEGER_PARAMS = (hs.HopsInteger,)
+BOOLEAN_PARAMS = (hs.HopsBoolean,)
+XYZ_PARAMS = (hs.HopsPoint, hs.HopsVector)
+STRING_PARAMS = (hs.HopsString,)
+
+_XYZ_FORMAT = '{"X": %s, "Y": %s, "Z": %s}'
+
+# compact encoding, asked for with "encoding": "float64" in a solve request
+# a block item holds a whole branch of numbers, points or vectors as base64
+# little-endian float64 values (X, Y, Z of each point/vector in a row)
+BLOCK_ENCODING = "float64"
+BLOCK_TYPE = "Float64Block"
+BLOCK_PARAMS = NUMBER_PARAMS + XYZ_PARAMS
+
+# decoded rhino geometry by content hash of its json, so solves that send
+# the same curve again skip decoding it. handlers must not modify it
+geometry_cache = SolveCache(int(os.environ.get("HOPS_GEOMETRY_CACHE_SIZE", 64)), ttl=0)
+
+
+def decode_geometry(data):
+    """Decode the json data of one geometry item, through geometry_cache"""
+    key = hashlib.sha1(data.encode("utf-8")).digest()
+    geometry = geometry_cache.get(key)
+    if geometry is None:
+        geometry = hparams.RHINO_FROMJSON(json.loads(data))
+        geometry_cache.put(key, geometry)
+    return geometry
+
+
+def decode_items(param, items):
+    """Decode a flat list of Hops value items into one array"""
+    datas = [item["data"] for item in items]
+    if isinstance(param, NUMBER_PARAMS):
+        return np.array(datas, dtype=np.float64)
+    if isinstance(param, INTEGER_PARAMS):
+        return np.array(datas, dtype=np.int64)
+    if isinstance(param, BOOLEAN_PARAMS):
+        return np.array([d.lower() == "true" for d in datas], dtype=bool)
+    if isinstance(param, XYZ_PARAMS):
+        # one json parse for the whole list instead of one per point
+        xyz = json.loads("[" + ",".join(datas) + "]")
+        return np.array(
+            [(p["X"], p["Y"], p.get("Z", 0.0)) for p in xyz], dtype=np.float64
+        ).reshape(-1, 3)
+    if isinstance(param, STRING_PARAMS):
+        return np.array(json.loads("[" + ",".join(datas) + "]"), dtype=object)
+    # everything else is rhino geometry
+    geometry = np.empty(len(datas), dtype=object)
+    for i, d in enumerate(datas):
+        geometry[i] = decode_geometry(d)
+    return geometry
+
+
+def _is_block(branch):
+    return bool(branch) and branch[0]["type"] == BLOCK_TYPE
+
+
+def decode_block(param, items):
+    """Decode the block items of one branch into one array"""
+    if not isinstance(param, BLOCK_PARAMS):
+        raise ValueError(f"Input {param.name} does not take {BLOCK_TYPE} items")
+    raw = b"".join(base64.b64decode(item["data"]) for item in items)
+    data = np.frombuffer(raw, dtype="<f8").astype(np.float64)
+    if isinstance(param, XYZ_PARAMS):
+        if len(data) % 3:
+            raise ValueError(f"Input {param.name} block is not made of X, Y, Z rows")
+        return data.reshape(-1, 3)
+    return data
+
+
+def encode_block(data):
+    """One block item holding a whole array"""
+    raw = np.ascontiguousarray(data, dtype="<f8").tobytes()
+    return {"type": BLOCK_TYPE, "data": base64.b64encode(raw).decode("ascii")}
+
+
+def decode_param(param, value):
+    """Decode one input param of a solve request
+
+    TREE access params become a Tree, everything else a flat array
+    """
+    inner_tree = value["InnerTree"]
+    paths = list(inner_tree.keys())
+    branches = [inner_tree[path] for path in paths]
+    if any(_is_block(branch) for branch in branches):
+        parts = [
+            decode_block(param, branch) if _is_block(branch) else decode_items(param, branch)
+            for branch in branches
+        ]
+        counts = [len(part) for part in parts]
+        data = np.concatenate(parts) if parts else decode_items(param, [])
+    else:
+        counts = [len(branch) for branch in branches]
+        data = decode_items(param, [item for branch in branches for item in branch])
+    if param.access == hs.HopsParamAccess.TREE:
+        return Tree(paths, counts, data)
+    return data
+
+
+def decode_inputs(params, values):
+    """Decode the "values" of a solve request in param order"""
+    by_name = {value["ParamName"]: value for value in values}
+    inputs = []
+    for param in params:
+        if param.name in by_name:
+            inputs.append(decode_param(param, by_name[param.name]))
+        elif param.optional or param.default is not inspect.Parameter.empty:
+            inputs.append(_missing_param(param))
+        else:
+            raise ValueError(f"Missing value for required input {param.name}")
+    return inputs
+
+
+def _missing_param(param):
+    # an input that was not sent: its default, or no data at all
+    if param.default is inspect.Parameter.empty or param.default is None:
+        data = decode_items(param, [])
+    else:
+        data = np.asarray(param.default).reshape(-1)
+    if param.access == hs.HopsParamAccess.TREE:
+        return Tree(["{0}"] if len(data) else [], [len(data)] if len(data) else [], data)
+    return data
+
+
+def expand_blocks(params, values):
+    """The "values" of a solve request with block items made standard items
+
+    for components that take their inputs item by item
+    """
+    if not any(_is_block(b) for value in values for b in value["InnerTree"].values()):
+        return values
+    by_name = {param.name: param for param in params}
+    expanded = []
+    for value in values:
+        param = by_name.get(value["ParamName"])
+        inner_tree = value["InnerTree"]
+        if param is not None and any(_is_block(b) for b in inner_tree.values()):
+            inner_tree = {
+                path: encode_items(param, decode_block(param, branch))
+                if _is_block(branch) else branch
+                for path, branch in inner_tree.items()
+            }
+            value = dict(value, InnerTree=inner_tree)
+        expanded.append(value)
+    return expanded
+
+
+def from_input(param, value):
+    """param.from_input with rhino geometry decoded through geometry_cache
+
+    for components that take their inputs item by item
+    """
+    def coerce(item):
+        if not isinstance(param.coercers, dict) and item["type"].startswith("Rhino.Geometry."):
+            return decode_geometry(item["data"])
+        return param._coerce_value(item["type"], item["data"])
+
+    inner_tree = value["InnerTree"]
+    if param.access == hs.HopsParamAccess.TREE:
+        return {path: [coerce(item) for item in items] for path, items in inner_tree.items()}
+    data = [coerce(item) for item in inner_tree["{0}"]]
+    if param.access == hs.HopsParamAccess.ITEM:
+        return data[0]
+    return data
+
+
+def _dump_values(data):
+    # one json dump for the whole array, then split it into items
+    values = data.reshape(-1).tolist()
+    return json.dumps(values)[1:-1].split(", ") if values else []
+
+
+def encode_items(param, data):
+    """Encode an array into a list of Hops value items"""
+    result_type = param.result_type
+    if isinstance(param, XYZ_PARAMS):
+        xyz = _dump_values(np.asarray(data, dtype=np.float64))
+        texts = [_XYZ_FORMAT % row for row in zip(xyz[0::3], xyz[1::3], xyz[2::3])]
+    elif isinstance(param, NUMBER_PARAMS + INTEGER_PARAMS + BOOLEAN_PARAMS):
+        texts = _dump_values(np.asarray(data))
+    else:
+        texts = [hparams.RHINO_TOJSON(hparams.CONVERT_VALUE(v)) for v in data]
+    return [{"type": result_type, "data": text} for text in texts]
+
+
+def _encode_blocks(param, value):
+    # one block item per branch
+    if isinstance(value, Tree):
+        data = np.asarray(value.data, dtype=np.float64)
+        inner_tree = {}
+        start = 0
+        for path, count in zip(value.paths, value.counts):
+            inner_tree[path] = [encode_block(data[start:start + count])] if count else []
+            start += count
+    else:
+        inner_tree = {"0": [encode_block(value)]}
+    return {"ParamName": param.name, "InnerTree": inner_tree}
+
+
+def encode_param(param, value, encoding=None):
+    """Encode one output param of a solve response
+
+    encoding=BLOCK_ENCODING packs number, point and vector outputs into blocks
+    """
+    if encoding == BLOCK_ENCODING and isinstance(param, BLOCK_PARAMS):
+        return _encode_blocks(param, value)
+    if isinstance(value, Tree):
+        items = encode_items(param, value.data)
+        inner_tree = {}
+        start = 0
+        for path, count in zip(value.paths, value.counts):
+            inner_tree[path] = items[start:start + count]
+            start += count
+    else:
+        if not isinstance(value, (np.ndarray, list, tuple)):
+            value = [value]
+        inner_tree = {"0": encode_items(param, value)}
+    return {"ParamName": param.name, "InnerTree": inner_tree}
+
+
+def encode_outputs(params, returns, encoding=None):
+    """Encode handler results into a solve response in one pass"""
+    if not isinstance(returns, tuple):
+        returns = (returns,)
+    outputs = [
+        encode_param(param, value, encoding) for param, value in zip(params, returns)
+    ]
+    return json.dumps({"values": outputs})
+
+
+def broadcast(data, count):
+    """Match an input to count items the way Grasshopper does (longest list)"""
+    data = np.asarray(data)
+    if data.ndim == 0:
+        return np.repeat(data.reshape(1), count)
+    size = len(data)
+    if size == count:
+        return data
+    if size == 0:
+        raise ValueError("Input has no data")
+    if size > count:
+        return data[:count]
+    # repeat the last item
+    pad = np.repeat(data[-1:], count - size, axis=0)
+    return np.concatenate([data, pad])
+
+
+def match_branches(trees):
+    """Match data trees branch by branch the way Grasshopper does
+
+    the branches are those of the tree with the most branches, a tree with
+    fewer repeats its last branch. inside each branch the longest list
+    wins and shorter ones repeat their last item.
+    returns the paths, the item count of each branch and the data of every
+    tree matched to them
+    """
+    layout = max(trees, key=lambda tree: len(tree.paths))
+    if all(list(tree.counts) == list(layout.counts) for tree in trees):
+        return list(layout.paths), list(layout.counts), [tree.data for tree in trees]
+    if any(not len(tree.paths) for tree in trees):
+        raise ValueError("Input has no data")
+    branches = np.arange(len(layout.paths))
+    # branch of each tree used for each output branch, and its size
+    used = [np.minimum(branches, len(tree.paths) - 1) for tree in trees]
+    sizes = [np.asarray(tree.counts, dtype=np.int64)[index] for tree, index in zip(trees, used)]
+    if any((size == 0).any() for size in sizes):
+        raise ValueError("Input has an empty branch")
+    counts = np.max(sizes, axis=0)
+    # position of every output item inside its branch
+    starts = np.cumsum(counts) - counts
+    local = np.arange(counts.sum()) - np.repeat(starts, counts)
+    matched = []
+    for tree, index, size in zip(trees, used, sizes):
+        offsets = np.cumsum(tree.counts) - np.asarray(tree.counts, dtype=np.int64)
+        items = np.repeat(offsets[index], counts) + np.minimum(local, np.repeat(size - 1, counts))
+        matched.append(np.asarray(tree.data)[items])
+    return list(layout.paths), counts.tolist(), matched
+
+
+def per_branch(tree, data):
+    """Tree of one item of data per branch of tree, on the same paths"""
+    return Tree(list(tree.paths), [1] * len(tree.paths), data)
+
+
+def is_streamed(value):
+    """True for outputs returned as an iterator of chunks, e.g. a generator"""
+    return isinstance(value, Iterator)
+
+
+def stream_outputs(params, returns, encoding=None):
+    """Encode handler results as a generator of json text
+
+    same response as encode_outputs. streamed outputs are encoded one chunk
+    at a time into branch "0", so only one chunk is held in memory
+    """
+    if not isinstance(returns, tuple):
+        returns = (returns,)
+    yield '{"values": ['
+    for index, (param, value) in enumerate(zip(params, returns)):
+        if index:
+            yield ", "
+        if not is_streamed(value):
+            yield json.dumps(encode_param(param, value, encoding))
+            continue
+        yield '{"ParamName": %s, "InnerTree": {"0": [' % json.dumps(param.name)
+        separator = ""
+        for chunk in value:
+            items = encode_items(param, chunk)
+            if items:
+                yield separator + json.dumps(items)[1:-1]
+                separator = ", "
+        yield "]}}"
+    yield "]}"
@@ -0,0 +1,178 @@
+"""Compile formula expressions into vectorized NumPy kernels
+
+a formula is "<output nickname> = <expression>" where the expression
+uses the input nicknames, numbers, + - * / // % **, pi, e and the
+functions in FUNCTIONS. every formula is checked against that grammar
+and compiled once into a plain Python function of the inputs, which
+works on single floats and on whole NumPy arrays alike.
+"""
+import ast
+import functools
+import linecache
+import math
+import re
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+# formula function name -> NumPy ufunc
+FUNCTIONS = {
+    "abs": "absolute",
+    "sqrt": "sqrt",
+    "exp": "exp",
+    "log": "log",
+    "log10": "log10",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "asin": "arcsin",
+    "acos": "arccos",
+    "atan": "arctan",
+    "atan2": "arctan2",
+    "hypot": "hypot",
+    "degrees": "degrees",
+    "radians": "radians",
+    "min": "minimum",
+    "max": "maximum",
+}
+
+# functions of two arguments, the rest take one. min and max take two or
+# more, folded pairwise, since a third argument of a ufunc is its output
+_BINARY = {"atan2", "hypot"}
+_FOLDED = {"min", "max"}
+
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+_OPERATORS = (
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+)
+_RESERVED = set(FUNCTIONS) | set(CONSTANTS) | {"np"}
+
+
+class _Compiler(ast.NodeTransformer):
+    # checks one expression and rewrites it to use NumPy
+    def __init__(self, formula, names):
+        self.formula = formula
+        self.names = names
+
+    def fail(self, reason):
+        raise ValueError(f"Invalid formula {self.formula!r}: {reason}")
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Load) + _OPERATORS):
+            self.fail(f"{type(node).__name__} is not allowed")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if type(node.value) not in (int, float):
+            self.fail(f"{node.value!r} is not a number")
+        # float math, so no formula can ask for a huge integer power
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+    def visit_Name(self, node):
+        if node.id in CONSTANTS:
+            return ast.copy_location(ast.Constant(CONSTANTS[node.id]), node)
+        if node.id not in self.names:
+            self.fail(f"unknown name {node.id!r}")
+        return node
+
+    def visit_Call(self, node):
+        func = node.func
+        if not isinstance(func, ast.Name) or func.id not in FUNCTIONS:
+            self.fail(f"unknown function {ast.unparse(func)!r}")
+        if node.keywords:
+            self.fail("keyword arguments are not allowed")
+        count = len(node.args)
+        if func.id in _FOLDED:
+            if count < 2:
+                self.fail(f"{func.id}() takes at least 2 arguments, got {count}")
+        elif func.id in _BINARY:
+            if count != 2:
+                self.fail(f"{func.id}() takes 2 arguments, got {count}")
+        elif count != 1:
+            self.fail(f"{func.id}() takes 1 argument, got {count}")
+        args = [self.visit(arg) for arg in node.args]
+        ufunc = ast.Attribute(ast.Name("np", ast.Load()), FUNCTIONS[func.id], ast.Load())
+        call = ast.Call(ufunc, args[:2], [])
+        for arg in args[2:]:
+            call = ast.Call(ufunc, [call, arg], [])
+        return ast.copy_location(call, node)
+
+
+def parse_formula(formula, names):
+    """Split "<output> = <expression>" and check the expression
+
+    returns the output name and the expression rewritten to use NumPy
+    """
+    target, sep, expression = formula.partition("=")
+    target = target.strip()
+    if not sep or not target.isidentifier():
+        raise ValueError(f"Invalid formula {formula!r}: expected '<output> = <expression>'")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as error:
+        raise ValueError(f"Invalid formula {formula!r}: {error.msg}") from None
+    tree = _Compiler(formula, names).visit(tree)
+    return target, ast.unparse(tree)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_formula(name, formulas, inputs, outputs, input_scales=None, output_scales=None):
+    """Kernel function(*inputs) returning the outputs of the formulas
+
+    name: function name, e.g. the component name
+    formulas: tuple of "<output> = <expression>", one per output
+    inputs, outputs: tuples of the input and output nicknames
+    input_scales, output_scales: tuples of factors the inputs are multiplied
+        by before and the outputs after the formulas, e.g. unit conversions
+    """
+    return make_kernel(name, formulas, inputs, outputs, input_scales, output_scales)
+
+
+def make_kernel(
+    name, formulas, inputs, outputs, input_scales=None, output_scales=None, register_source=True
+):
+    """compile_formula without the cache
+
+    register_source=False skips keeping the source for tracebacks, for
+    formulas that come with requests and should not stay in memory
+    """
+    for nickname in inputs:
+        if not nickname.isidentifier() or nickname in _RESERVED:
+            raise ValueError(f"Input nickname {nickname!r} can not be used in a formula")
+    expressions = {}
+    for formula in formulas:
+        target, expression = parse_formula(formula, set(inputs))
+        if target not in outputs:
+            raise ValueError(f"Formula {formula!r} does not set one of the outputs {outputs}")
+        if target in expressions:
+            raise ValueError(f"Output {target!r} is set by more than one formula")
+        expressions[target] = expression
+    missing = [nickname for nickname in outputs if nickname not in expressions]
+    if missing:
+        raise ValueError(f"No formula for the outputs {missing}")
+
+    func_name = re.sub(r"\W", "_", name)
+    # one multiply per input and output, skipped where the factor is 1
+    lines = [
+        f"    {nickname} = {nickname} * {scale!r}\n"
+        for nickname, scale in zip(inputs, input_scales or ())
+        if scale != 1.0
+    ]
+    returns = ", ".join(
+        f"({expressions[nickname]}) * {scale!r}" if scale != 1.0 else expressions[nickname]
+        for nickname, scale in zip(outputs, output_scales or (1.0,) * len(outputs))
+    )
+    source = f"def {func_name}({', '.join(inputs)}):\n{''.join(lines)}    return {returns}\n"
+    filename = f"<formula {name}>"
+    if register_source:
+        # so tracebacks and the cache code version see the source
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {"np": np, "__name__": __name__}
+    exec(compile(source, filename, "exec"), namespace)
+    kernel = namespace[func_name]
+    kernel.__doc__ = "\n".join(formulas)
+    return kernel
@@ -0,0 +1,124 @@
+"""Vectorized NumPy kernels for the batch components
+
+points and vectors are Nx3 float64 arrays, one row per item. the vector
+math runs on vec3.Vector3 batches, which hand back their Nx3 buffers
+"""
+import polar
+from lazy import lazy_import
+from vec3 import Vector3
+
+np = lazy_import("numpy")
+
+
+def points(xyz):
+    """View any point/vector input as an Nx3 float64 array"""
+    return np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+
+
+def vector(a, b):
+    """Vectors from points a to points b"""
+    return Vector3.between(a, b).xyz
+
+
+def vector_addition(a, b, c):
+    """a->b and b->c added tip to tail"""
+    v1 = Vector3.between(a, b)
+    v2 = Vector3.between(b, c)
+    return v1.xyz, v2.xyz, (v1 + v2).xyz
+
+
+def vector_sum(*vectors):
+    """Resultant of vectors added component by component"""
+    # one buffer, added into in place
+    total = Vector3.zeros(len(points(vectors[0])))
+    for v in vectors:
+        total += v
+    return total.xyz
+
+
+def component_method(v1, v2, v3):
+    """Resultant, magnitude and angle from +X (atan2) of three vectors"""
+    total = Vector3(vector_sum(v1, v2, v3))
+    return total.xyz, total.norm(), total.angle()
+
+
+def unit_vector(v):
+    """Unit vectors, zero length vectors stay zero"""
+    return Vector3(v).normalize().xyz
+
+
+def tip_to_tail(*corners):
+    """Vectors between consecutive points and their resultant"""
+    vectors = [vector(a, b) for a, b in zip(corners, corners[1:])]
+    return (*vectors, vector_sum(*vectors))
+
+
+def parallelogram(a, b, c):
+    """a->b and a->c added as adjacent sides of a parallelogram"""
+    v1 = Vector3.between(a, b)
+    v2 = Vector3.between(a, c)
+    return v1.xyz, v2.xyz, (v1 + v2).xyz
+
+
+def vector_subtraction(a, b, c):
+    """a->b minus b->c"""
+    v1 = Vector3.between(a, b)
+    v2 = Vector3.between(b, c)
+    return v1.xyz, v2.xyz, (v1 - v2).xyz
+
+
+def group_sums(values, counts):
+    """Sums of values (N or Nx3) over consecutive groups of counts items
+
+    one np.add.reduceat pass, empty groups sum to zero
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    sums = np.zeros((len(counts),) + values.shape[1:])
+    filled = counts > 0
+    if filled.any():
+        starts = np.cumsum(counts) - counts
+        # the groups in between are empty, so each sum ends at the next start
+        sums[filled] = np.add.reduceat(values, starts[filled], axis=0)
+    return sums
+
+
+def resultant(vectors, counts):
+    """Resultant, magnitude and angle from +X (atan2) of each group of vectors"""
+    total = Vector3(group_sums(points(vectors), counts))
+    return total.xyz, total.norm(), total.angle()
+
+
+def polar_vectors(lengths, angles, degrees=False):
+    """x, y and the Nx3 XY plane vectors of polar vectors"""
+    xyz = np.zeros((len(lengths), 3))
+    xyz[:, 0], xyz[:, 1] = polar.to_cartesian(lengths, angles, degrees)
+    return xyz[:, 0], xyz[:, 1], xyz
+
+
+def polar_resultant(lengths, angles, counts, degrees=False):
+    """resultant() of groups of polar vectors, angles in and out in degrees
+    with degrees=True, else in radians
+    """
+    if np.shape(lengths) != np.shape(angles):
+        raise ValueError("Need one angle per length")
+    _, _, xyz = polar_vectors(lengths, angles, degrees)
+    vectors, magnitudes, angles = resultant(xyz, counts)
+    return vectors, magnitudes, polar.from_radians(angles, degrees)
+
+
+def graphical_method(l1, a1, l2, a2):
+    """polar_resultant() of pairs of polar vectors, angles in radians"""
+    lengths = np.column_stack([l1, l2]).ravel()
+    angles = np.column_stack([a1, a2]).ravel()
+    return polar_resultant(lengths, angles, np.full(len(lengths) // 2, 2))
+
+
+def curve_points(curves, ts):
+    """Points at the parameters ts, one curve per parameter"""
+    # rhino3dm evaluates one parameter per call, keep the loop tight
+    xyz = []
+    for curve, t in zip(curves.tolist(), ts.tolist()):
+        point = curve.PointAt(t)
+        xyz.append((point.X, point.Y, point.Z))
+    return np.array(xyz, dtype=np.float64).reshape(-1, 3)
@@ -0,0 +1,293 @@
+"""Load generator: many concurrent Hops clients against a running server
+
+Simulates Grasshopper canvases solving through Hops, to size hardware
+without Rhino seats. Like Hops, each client asks a component path for its
+metadata (GET /<component>) the first time it uses it, then solves it
+(POST /solve). Payloads are made from the component metadata like bench.py.
+
+    python loadgen.py                                    # closed loop, 1..32 clients
+    python loadgen.py --clients 1,4,16,64 --duration 20
+    python loadgen.py --mix "/toy_train_01=4,/pointat=1,/vector_addition_02_batch=1"
+    python loadgen.py --arrival open --rates 50,100,200,400
+
+Closed loop: each client sends its next request when the last one is
+answered (after --think seconds on average), swept over --clients.
+Open loop: requests arrive at --rates per second no matter how fast the
+server answers, and their latency counts from the arrival, so queueing
+shows up. Throughput, latency percentiles and error rate of every step
+go to --output as JSON.
+"""
+import argparse
+import http.client
+import json
+import platform
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+from bench import HttpDriver, components, make_payload, takes_lists
+from metrics import percentile
+
+
+# one request: "metadata" (GET /<component>) or "solve" (POST /solve)
+Request = namedtuple("Request", "uri kind started latency ok")
+
+
+def parse_mix(spec, available):
+    """{uri: weight} of "<uri>[=<weight>],...", every component if empty"""
+    if not spec:
+        return {uri: 1.0 for uri in available}
+    mix = {}
+    for part in spec.split(","):
+        uri, _, weight = part.strip().partition("=")
+        uri = "/" + uri.strip("/")
+        if uri not in available:
+            raise SystemExit(f"Unknown component {uri}")
+        mix[uri] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """Payloads and weights of the endpoint mix, shared by all clients
+
+    every endpoint gets variants different payloads, so that not every
+    solve is a server cache hit
+    """
+
+    def __init__(self, metadata, mix, items=100, variants=64, encoding=None, seed=0):
+        self.bodies = {}
+        for uri in mix:
+            component = metadata[uri]
+            count = items if takes_lists(component) else 1
+            try:
+                self.bodies[uri] = [
+                    json.dumps(make_payload(component, count, seed=seed + variant, encoding=encoding))
+                    for variant in range(variants)
+                ]
+            except ValueError as skip:
+                print(f"{uri:<40} skipped: {skip}")
+        if not self.bodies:
+            raise SystemExit("No component in the mix can be solved")
+        self.uris = list(self.bodies)
+        self.weights = [mix[uri] for uri in self.uris]
+
+    def pick(self, rnd):
+        uri = rnd.choices(self.uris, self.weights)[0]
+        return uri, rnd.choice(self.bodies[uri])
+
+
+class Connection:
+    """One keep-alive connection of a simulated client"""
+
+    def __init__(self, url, results):
+        self.url = url
+        self.results = results
+        self.driver = HttpDriver(url)
+        # components whose metadata this client has asked for
+        self.known = set()
+
+    def _request(self, uri, kind, path, body, started):
+        try:
+            if body is None:
+                status, _ = self.driver.get(path)
+            else:
+                status, _ = self.driver.post(path, body)
+            ok = status == 200
+        except (http.client.HTTPException, OSError):
+            ok = False
+            self.driver = HttpDriver(self.url)
+        self.results.append(Request(uri, kind, started, time.perf_counter() - started, ok))
+
+    def solve(self, uri, body, started=None):
+        """Metadata the first time, then the solve. started defaults to now"""
+        if uri not in self.known:
+            self.known.add(uri)
+            self._request(uri, "metadata", uri, None, time.perf_counter())
+        if started is None:
+            started = time.perf_counter()
+        self._request(uri, "solve", "/solve", body, started)
+
+
+def closed_loop(url, workload, clients, stop_at, think=0.0, seed=0):
+    """clients connections, each solving one request after the other"""
+    results = []
+
+    def client(number):
+        rnd = random.Random(seed + number)
+        connection = Connection(url, results)
+        while time.perf_counter() < stop_at:
+            connection.solve(*workload.pick(rnd))
+            if think:
+                time.sleep(rnd.expovariate(1.0 / think))
+
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, 0
+
+
+def open_loop(url, workload, rate, stop_at, connections=64, seed=0):
+    """Poisson arrivals at rate per second, sent over up to connections
+
+    returns the results and how many arrivals were never sent because
+    every connection was still busy when the step ended
+    """
+    results = []
+    unsent = []
+    arrivals = queue.Queue()
+
+    def sender():
+        connection = Connection(url, results)
+        while True:
+            arrival = arrivals.get()
+            if arrival is None:
+                return
+            if time.perf_counter() > stop_at:
+                # the step is over, drop the backlog
+                unsent.append(arrival)
+                continue
+            connection.solve(*arrival)
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    rnd = random.Random(seed)
+    arrival = time.perf_counter()
+    while arrival < stop_at:
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        uri, body = workload.pick(rnd)
+        arrivals.put((uri, body, arrival))
+        arrival += rnd.expovariate(rate)
+    for _ in threads:
+        arrivals.put(None)
+    for thread in threads:
+        thread.join()
+    return results, len(unsent)
+
+
+def _latencies(requests):
+    ordered = sorted(request.latency for request in requests)
+    return {
+        "p50_ms": percentile(ordered, 0.50) * 1000.0,
+        "p95_ms": percentile(ordered, 0.95) * 1000.0,
+        "p99_ms": percentile(ordered, 0.99) * 1000.0,
+        "max_ms": ordered[-1] * 1000.0 if ordered else 0.0,
+    }
+
+
+def summarize(results, measure_from, duration, unsent=0):
+    """Throughput, latency and errors of the requests started in the window"""
+    measured = [request for request in results if request.started >= measure_from]
+    solves = [request for request in measured if request.kind == "solve"]
+    errors = sum(1 for request in solves if not request.ok) + unsent
+    endpoints = {}
+    for uri in sorted({request.uri for request in solves}):
+        requests = [request for request in solves if request.uri == uri]
+        endpoints[uri] = {
+            "requests": len(requests),
+            "errors": sum(1 for request in requests if not request.ok),
+            **_latencies(requests),
+        }
+    return {
+        "requests": len(solves),
+        "metadata_requests": len(measured) - len(solves),
+        "unsent": unsent,
+        "errors": errors,
+        "error_rate": errors / (len(solves) + unsent) if solves or unsent else 0.0,
+        "requests_per_second": len(solves) / duration,
+        **_latencies(solves),
+        "endpoints": endpoints,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="server to load")
+    parser.add_argument(
+        "--mix", help='endpoint weights, "<uri>=<weight>,...", default: every component'
+    )
+    parser.add_argument("--arrival", choices=["closed", "open"], default="closed")
+    parser.add_argument(
+        "--clients", default="1,2,4,8,16,32", help="closed loop: concurrent clients per step"
+    )
+    parser.add_argument("--rates", default="10,20,50,100", help="open loop: requests/s per step")
+    parser.add_argument(
+        "--connections", type=int, default=64, help="open loop: most requests in flight"
+    )
+    parser.add_argument(
+        "--think", type=float, default=0.0, help="closed loop: mean seconds between requests"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds per step")
+    parser.add_argument("--items", type=int, default=100, help="items per list/tree input")
+    parser.add_argument("--variants", type=int, default=64, help="different payloads per endpoint")
+    parser.add_argument(
+        "--encoding", choices=["float64"],
+        help="send list/tree inputs as compact blocks and ask for blocks back",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadgen_output.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metadata = {component["Uri"]: component for component in components(HttpDriver(args.url))}
+    mix = parse_mix(args.mix, metadata)
+    workload = Workload(metadata, mix, args.items, args.variants, args.encoding, args.seed)
+
+    if args.arrival == "closed":
+        steps = [int(clients) for clients in args.clients.split(",")]
+        label = "clients"
+    else:
+        steps = [float(rate) for rate in args.rates.split(",")]
+        label = "rate"
+    results = []
+    for step in steps:
+        measure_from = time.perf_counter() + args.warmup
+        stop_at = measure_from + args.duration
+        if args.arrival == "closed":
+            requests, unsent = closed_loop(
+                args.url, workload, step, stop_at, args.think, args.seed
+            )
+        else:
+            requests, unsent = open_loop(
+                args.url, workload, step, stop_at, args.connections, args.seed
+            )
+        result = {label: step, **summarize(requests, measure_from, args.duration, unsent)}
+        results.append(result)
+        print(
+            f"{label} {step:>8g} {result['requests_per_second']:>10.1f} req/s "
+            f"p50 {result['p50_ms']:>9.3f} p95 {result['p95_ms']:>9.3f} "
+            f"p99 {result['p99_ms']:>9.3f} ms  errors {result['error_rate']:.2%}"
+        )
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": args.url,
+            "arrival": args.arrival,
+            "mix": {uri: mix[uri] for uri in workload.uris},
+            "items": args.items,
+            "variants": args.variants,
+            "duration": args.duration,
+            "think": args.think,
+            "encoding": args.encoding,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as out_file:
+        json.dump(report, out_file, indent=1)
+    print(f"wrote {len(results)} steps to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Per component latency and throughput metrics"""
+import threading
+import time
+from collections import deque
+
+
+STAGES = ("decode", "compute", "encode", "total")
+
+
+class Sample:
+    """Timings and sizes of one solve request, in seconds and bytes"""
+
+    __slots__ = (
+        "started", "decode", "compute", "encode", "items", "bytes_in", "bytes_out",
+        "cached", "coalesced",
+    )
+
+    def __init__(self, bytes_in=0):
+        self.started = time.perf_counter()
+        self.decode = 0.0
+        self.compute = 0.0
+        self.encode = 0.0
+        self.items = 0
+        self.bytes_in = bytes_in
+        self.bytes_out = 0
+        self.cached = False
+        # shared the result of an identical solve that was already running
+        self.coalesced = False
+
+    def stages(self):
+        return self.decode, self.compute, self.encode
+
+    def add_stages(self, stages):
+        decode, compute, encode = stages
+        self.decode += decode
+        self.compute += compute
+        self.encode += encode
+
+
+def count_items(values):
+    """Number of items in the input "values" of a solve request"""
+    return sum(
+        len(branch) for value in values for branch in value["InnerTree"].values()
+    )
+
+
+def percentile(ordered, fraction):
+    """Value at fraction (0..1) of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _ComponentStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.items = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy = 0.0
+        # latencies of the last window requests, per stage
+        self.latencies = {stage: deque(maxlen=window) for stage in STAGES}
+
+    def snapshot(self):
+        latency = {}
+        for stage, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latency[stage] = {
+                "p50_ms": percentile(ordered, 0.50) * 1000.0,
+                "p95_ms": percentile(ordered, 0.95) * 1000.0,
+                "p99_ms": percentile(ordered, 0.99) * 1000.0,
+            }
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "items_in": self.items,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "busy_seconds": self.busy,
+            "latency": latency,
+        }
+
+
+class Metrics:
+    """Thread safe collector of solve samples, keyed by component uri
+
+    percentiles are taken over the last window requests of each component
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.started = time.time()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, uri, sample, ok):
+        total = time.perf_counter() - sample.started
+        with self._lock:
+            stats = self._stats.get(uri)
+            if stats is None:
+                stats = self._stats[uri] = _ComponentStats(self.window)
+            stats.requests += 1
+            stats.errors += 0 if ok else 1
+            stats.cache_hits += 1 if sample.cached else 0
+            stats.coalesced += 1 if sample.coalesced else 0
+            stats.items += sample.items
+            stats.bytes_in += sample.bytes_in
+            stats.bytes_out += sample.bytes_out
+            stats.busy += total
+            latencies = stats.latencies
+            latencies["total"].append(total)
+            if not (sample.cached or sample.coalesced):
+                latencies["decode"].append(sample.decode)
+                latencies["compute"].append(sample.compute)
+                latencies["encode"].append(sample.encode)
+
+    def snapshot(self):
+        """Stats of every component that has been solved, busiest first"""
+        with self._lock:
+            components = {uri: stats.snapshot() for uri, stats in self._stats.items()}
+        uptime = time.time() - self.started
+        for stats in components.values():
+            stats["requests_per_second"] = stats["requests"] / uptime if uptime else 0.0
+        return {
+            "uptime_seconds": uptime,
+            "components": dict(
+                sorted(components.items(), key=lambda item: -item[1]["busy_seconds"])
+            ),
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started = time.time()
@@ -0,0 +1,852 @@
+"""Hops flask middleware with array-backed batch components"""
+import importlib
+import inspect
+import json
+import os
+import os.path as op
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+import ghhops_server as hs
+from ghhops_server import base as hbase
+from ghhops_server import params as hparams
+from ghhops_server.component import HopsComponent
+from ghhops_server.logger import logging, hlogger
+
+import codec
+import formula
+import sweep
+import units
+from cache import SolveCache, code_version, input_hash, modules_version
+from coalesce import SingleFlight
+from lazy import lazy_import
+from metrics import Metrics, Sample, count_items
+from pipeline import Pipeline
+from pool import WorkerPool, from_worker, to_worker
+from profiler import NO_CAPTURE, Profiler
+from store import ResultStore
+
+np = lazy_import("numpy")
+rhino3dm = lazy_import("rhino3dm")
+
+
+BATCH_SUFFIX = "_batch"
+
+
+def _tree_param(param):
+    # copy of a param that takes/returns the whole data tree
+    default = None if param.default is inspect.Parameter.empty else param.default
+    return type(param)(
+        param.name,
+        param.nickname,
+        param.description,
+        access=hs.HopsParamAccess.TREE,
+        optional=param.optional,
+        default=default,
+    )
+
+
+def _init_params():
+    # what hs.params._init_rhino3dm() sets up, except that rhino3dm is
+    # imported by the first component that decodes geometry, not at startup
+    hparams.RHINO_FROMJSON = lambda json_obj: rhino3dm.CommonObject.Decode(json_obj)
+    hparams.RHINO_TOJSON = lambda value: json.dumps(value, cls=hbase._HopsEncoder)
+    hparams.RHINO_GEOM = rhino3dm
+    hparams.CONVERT_VALUE = lambda value: value
+
+
+def _solve_in_worker(module_name, uri, data):
+    # runs in a pool process, where importing the module registered the
+    # components on its own PhysicsHops instance
+    module = importlib.import_module(module_name)
+    for hops in vars(module).values():
+        if isinstance(hops, PhysicsHops):
+            sample = Sample()
+            res, result = hops.solve_here(hops._components[uri], data, sample)
+            if not isinstance(result, str):
+                # a generator can not be sent back, stream it here instead
+                result = _joined(result)
+            return res, result, sample.stages()
+    raise LookupError(f"No PhysicsHops middleware in {module_name}")
+
+
+def _step_in_worker(module_name, uri, args):
+    # one pipeline step, run in a pool process like _solve_in_worker.
+    # rhino3dm values go over encoded, see pool.to_worker
+    module = importlib.import_module(module_name)
+    for hops in vars(module).values():
+        if isinstance(hops, PhysicsHops):
+            return to_worker(hops._components[uri].handler(*from_worker(args)))
+    raise LookupError(f"No PhysicsHops middleware in {module_name}")
+
+
+def _sweep_in_worker(module_name, uri, args, start, stop, input_names):
+    # one chunk of a sweep, run in a pool process like _solve_in_worker.
+    # args are the inputs of this chunk only, not the whole axes
+    module = importlib.import_module(module_name)
+    for hops in vars(module).values():
+        if isinstance(hops, PhysicsHops):
+            comp = hops._components[uri]
+            return sweep.chunk_line(
+                hops._kernels[uri], args, [p.name for p in comp.outputs], start, stop, input_names
+            )
+    raise LookupError(f"No PhysicsHops middleware in {module_name}")
+
+
+def _joined(chunks):
+    # one string of streamed chunks, which may be str or bytes
+    return "".join(
+        chunk if isinstance(chunk, str) else chunk.decode("utf-8") for chunk in chunks
+    )
+
+
+def _batch_handler(kernel, signature, module):
+    # run an elementwise kernel over whole data trees, matched branch by
+    # branch (see codec.match_branches). the output trees take the paths
+    # of the input with the most branches
+    def handler(*trees):
+        paths, counts, args = codec.match_branches(trees)
+        count = sum(counts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returned = kernel(*args)
+        if not isinstance(returned, tuple):
+            returned = (returned,)
+        return tuple(
+            codec.Tree(paths, counts, codec.broadcast(value, count)) for value in returned
+        )
+
+    handler.__signature__ = signature
+    handler.__name__ = kernel.__name__ + BATCH_SUFFIX
+    # the worker pool imports the module of the scalar component to solve it
+    handler.__module__ = module
+    return handler
+
+
+class PhysicsHops(hs.HopsFlask):
+    """Hops Flask middleware that can also solve whole data trees with NumPy
+
+    components registered with arrays=True get their inputs decoded into
+    NumPy arrays and their outputs encoded from arrays in one pass.
+    components registered with batch= also get a "<uri>_batch" twin that
+    takes whole data trees and runs the formula as one vectorized kernel.
+    solve requests with "encoding": "float64" may send numbers, points and
+    vectors as base64 float64 blocks and get the outputs of array components
+    back the same way, see codec.py.
+
+    solve results are cached per component and inputs. the cache size,
+    memory and time to live default to the HOPS_CACHE_SIZE,
+    HOPS_CACHE_MEMORY (megabytes) and HOPS_CACHE_TTL env vars.
+    identical solves that arrive while the first is still running wait for
+    it and share its result (HOPS_COALESCE=0 turns that off). with
+    HOPS_STORE_DIR set, cached results are also kept on disk (up to
+    HOPS_STORE_SIZE megabytes) and served again after a restart.
+
+    the next solves of a component can be profiled stage by stage, see
+    profiler.py (HOPS_PROFILE, HOPS_PROFILE_DIR).
+
+    array components may return a generator of chunks for an output, which
+    is then streamed to the client one chunk at a time and never cached.
+
+    components registered with process=True are solved in a pool of warm
+    worker processes (HOPS_POOL_WORKERS) so they do not hold the GIL of the
+    request threads.
+    """
+
+    def __init__(
+        self,
+        flask_app,
+        debug=False,
+        cache_size=None,
+        cache_ttl=None,
+        cache_memory=None,
+        pool_workers=None,
+        coalesce=None,
+        store_dir=None,
+        store_size=None,
+    ):
+        # hs.Hops() does this for us, but we create the middleware directly
+        hlogger.setLevel(logging.DEBUG if debug else logging.INFO)
+        _init_params()
+        super(PhysicsHops, self).__init__(flask_app)
+        # uris of components solved through the array codec
+        self._array_uris = set()
+        # function of each cached component, None if not cached
+        self._cached_funcs = {}
+        # vectorized kernel of each component registered with batch=
+        self._kernels = {}
+        # code version of each cached component, worked out on first solve
+        self._versions = {}
+        if cache_size is None:
+            cache_size = int(os.environ.get("HOPS_CACHE_SIZE", 1024))
+        if cache_ttl is None:
+            cache_ttl = float(os.environ.get("HOPS_CACHE_TTL", 3600))
+        if cache_memory is None:
+            cache_memory = float(os.environ.get("HOPS_CACHE_MEMORY", 256))
+        self.cache = SolveCache(cache_size, cache_ttl, int(cache_memory * 1024 * 1024))
+        if store_dir is None:
+            store_dir = os.environ.get("HOPS_STORE_DIR")
+        if store_size is None:
+            store_size = float(os.environ.get("HOPS_STORE_SIZE", 1024))
+        # cached results on disk, kept across restarts of the same code
+        store_version = None
+        if store_dir:
+            app_module = sys.modules.get(flask_app.import_name)
+            app_file = getattr(app_module, "__file__", None)
+            store_version = modules_version(app_file) if app_file else None
+        self.store = ResultStore(store_dir, int(store_size * 1024 * 1024), store_version)
+        if coalesce is None:
+            coalesce = os.environ.get("HOPS_COALESCE", "1") != "0"
+        # identical solves in progress, shared by concurrent requests
+        self.inflight = SingleFlight(coalesce)
+        # uris of components solved in the worker pool
+        self._process_uris = set()
+        self.pool = WorkerPool(pool_workers)
+        # latency and throughput of every component, see /metrics
+        self.metrics = Metrics()
+        # profiles of the next solves of chosen components, see /profile
+        self.profiler = Profiler(
+            os.environ.get("HOPS_PROFILE_DIR"), os.environ.get("HOPS_PROFILE")
+        )
+
+    def component(
+        self,
+        rule=None,
+        name=None,
+        nickname=None,
+        description=None,
+        category=None,
+        subcategory=None,
+        icon=None,
+        inputs=None,
+        outputs=None,
+        arrays=False,
+        batch=None,
+        cache=True,
+        process=False,
+    ):
+        """Decorator for Hops components
+
+        arrays: decode inputs into NumPy arrays and encode outputs from arrays
+        batch: True if the function itself works on arrays, or a vectorized
+               kernel with the same parameters; registers "<uri>_batch"
+        cache: False for components whose results must never be reused
+        process: solve in the worker process pool instead of the request thread
+        """
+
+        def __func_wrapper__(comp_func):
+            comp = self._register(
+                comp_func,
+                rule=rule,
+                name=name,
+                nickname=nickname,
+                description=description,
+                category=category,
+                subcategory=subcategory,
+                icon=icon,
+                inputs=inputs,
+                outputs=outputs,
+            )
+            if arrays:
+                self._array_uris.add(comp.uri)
+            if process:
+                self._process_uris.add(comp.uri)
+            self._cached_funcs[comp.uri] = comp_func if cache else None
+            if batch:
+                kernel = comp_func if batch is True else batch
+                self._kernels[comp.uri] = kernel
+                batch_comp = self._register_batch(
+                    comp, kernel, inspect.signature(comp_func)
+                )
+                self._cached_funcs[batch_comp.uri] = kernel if cache else None
+                if process:
+                    self._process_uris.add(batch_comp.uri)
+            return comp_func
+
+        return __func_wrapper__
+
+    def formula(
+        self,
+        rule=None,
+        formulas=(),
+        name=None,
+        nickname=None,
+        description=None,
+        category=None,
+        subcategory=None,
+        icon=None,
+        inputs=None,
+        outputs=None,
+        cache=True,
+        input_units=None,
+        output_units=None,
+    ):
+        """Register a component computed by formulas instead of a function
+
+        formulas: "<output nickname> = <expression of the input nicknames>",
+                  one per output, see formula.py for what they may use
+        input_units, output_units: {nickname: unit}, see units.py. with
+                  units the formulas are written in SI units: inputs are
+                  converted to SI before and outputs from SI after them,
+                  and the formulas are checked to give the output units
+        the formulas are compiled once into a NumPy kernel that solves
+        single values and, as the "<uri>_batch" twin, whole data trees.
+        returns the kernel
+        """
+        if isinstance(formulas, str):
+            formulas = (formulas,)
+        inputs = inputs or []
+        outputs = outputs or []
+        input_nicknames = tuple(param.nickname for param in inputs)
+        output_nicknames = tuple(param.nickname for param in outputs)
+        input_scales = output_scales = None
+        if input_units or output_units:
+            input_units = input_units or {}
+            output_units = output_units or {}
+            for text in formulas:
+                # the grammar first, so the unit check only sees valid formulas
+                formula.parse_formula(text, set(input_nicknames))
+                units.check_formula(text, input_units, output_units)
+            input_scales = tuple(
+                units.parse_unit(input_units[nickname])[0] if nickname in input_units
+                else 1.0
+                for nickname in input_nicknames
+            )
+            output_scales = tuple(
+                1.0 / units.parse_unit(output_units[nickname])[0] if nickname in output_units
+                else 1.0
+                for nickname in output_nicknames
+            )
+        kernel = formula.compile_formula(
+            (rule or name).strip("/"),
+            tuple(formulas),
+            input_nicknames,
+            output_nicknames,
+            input_scales,
+            output_scales,
+        )
+        # the kernel belongs to the module registering it, which is the one
+        # pool workers import to find this middleware
+        kernel.__module__ = sys._getframe(1).f_globals.get("__name__", kernel.__module__)
+        return self.component(
+            rule=rule,
+            name=name,
+            nickname=nickname,
+            description=description,
+            category=category,
+            subcategory=subcategory,
+            icon=icon,
+            inputs=inputs,
+            outputs=outputs,
+            batch=True,
+            cache=cache,
+        )(kernel)
+
+    def pipeline(
+        self,
+        rule=None,
+        steps=None,
+        returns=(),
+        name=None,
+        nickname=None,
+        description=None,
+        category=None,
+        subcategory=None,
+        icon=None,
+        inputs=None,
+        outputs=None,
+        cache=True,
+    ):
+        """Register a chain of already registered components as one component
+
+        steps: {step name: (component uri, {component input name: source})}
+               a source is a pipeline input nickname or "<step>.<output name>"
+        returns: one source per pipeline output
+        the steps pass their results to each other in memory, see pipeline.py.
+        steps must all be item components or all array components
+        """
+        inputs = inputs or []
+        outputs = outputs or []
+        if len(returns) != len(outputs):
+            raise ValueError("Pipeline needs one returned source per output")
+        pipeline = Pipeline(
+            self._components,
+            [param.nickname for param in inputs],
+            steps or {},
+            returns,
+            submit=self._submit_step,
+            process_uris=self._process_uris,
+        )
+        arrays = {uri in self._array_uris for uri in pipeline.step_uris}
+        if len(arrays) > 1:
+            raise ValueError("Pipeline mixes array and item components")
+        pipeline.__signature__ = pipeline.signature()
+        pipeline.__qualname__ = pipeline.__name__ = (rule or name).strip("/")
+        self.component(
+            rule=rule,
+            name=name,
+            nickname=nickname,
+            description=description or "Pipeline of " + ", ".join(pipeline.step_uris),
+            category=category,
+            subcategory=subcategory,
+            icon=icon,
+            inputs=inputs,
+            outputs=outputs,
+            arrays=arrays == {True},
+            cache=cache,
+        )(pipeline)
+        return pipeline
+
+    def _register(
+        self,
+        comp_func,
+        rule=None,
+        name=None,
+        nickname=None,
+        description=None,
+        category=None,
+        subcategory=None,
+        icon=None,
+        inputs=None,
+        outputs=None,
+    ):
+        # same as HopsBase.component, without the inspect.stack() call
+        # that costs milliseconds per component at startup
+        module = sys.modules.get(comp_func.__module__)
+        resource_path = None
+        if module and getattr(module, "__file__", None):
+            resource_path = op.dirname(module.__file__)
+
+        if inputs:
+            # apply function param default values in order to defined Hops inputs
+            f_params = inspect.signature(comp_func).parameters.values()
+            if len(inputs) != len(f_params):
+                raise Exception(
+                    "Number of function parameters is "
+                    "different from defined Hops inputs"
+                )
+            for hinput, fparam in zip(inputs, f_params):
+                if fparam.default != inspect.Parameter.empty:
+                    hinput.default = fparam.default
+
+        comp_name = name or comp_func.__qualname__
+        uri = rule or f"/{comp_name}"
+        icon_data = self._prepare_icon(resource_path, icon) if icon else None
+        comp = HopsComponent(
+            uri=uri,
+            name=comp_name,
+            nickname=nickname,
+            desc=description or comp_func.__doc__,
+            cat=category or hbase.DEFAULT_CATEGORY,
+            subcat=subcategory or hbase.DEFAULT_SUBCATEGORY,
+            icon=icon_data,
+            inputs=inputs or [],
+            outputs=outputs or [],
+            handler=comp_func,
+        )
+        hlogger.debug("Component registered: %s", comp)
+        self._components[uri] = comp
+        self._components[comp.solve_uri] = comp
+        return comp
+
+    def _register_batch(self, comp, kernel, signature):
+        batch_comp = self._register(
+            _batch_handler(kernel, signature, comp.handler.__module__),
+            rule=comp.uri + BATCH_SUFFIX,
+            name=f"{comp.name} (Batch)",
+            nickname=f"{comp.nickname}[]" if comp.nickname else None,
+            description=f"{comp.description} for whole data trees",
+            category=comp.category,
+            subcategory=comp.subcategory,
+            inputs=[_tree_param(p) for p in comp.inputs],
+            outputs=[_tree_param(p) for p in comp.outputs],
+        )
+        # reuse the already encoded icon of the scalar component
+        batch_comp.icon = comp.icon
+        self._array_uris.add(batch_comp.uri)
+        return batch_comp
+
+    def _submit_step(self, comp, args):
+        # run a pipeline step of a process component in the worker pool,
+        # None runs it in the request thread instead
+        if not self.pool.enabled:
+            return None
+        try:
+            args = to_worker(args)
+        except TypeError:
+            return None
+        module = comp.handler.__module__
+        try:
+            if not self.pool.running:
+                self.pool.start(module)
+            return self.pool.submit(_step_in_worker, module, comp.uri, args)
+        except BrokenProcessPool:
+            self.pool.restart()
+            return None
+
+    def _version(self, uri):
+        # code version of a cached component, None if it is not cached
+        version = self._versions.get(uri)
+        if version is None:
+            func = self._cached_funcs.get(uri)
+            if func is None:
+                return None
+            if isinstance(func, Pipeline):
+                # changes whenever the code of one of its steps does
+                step_versions = [self._version(step) for step in func.step_uris]
+                if None in step_versions:
+                    return None
+                version = func.version(step_versions)
+            else:
+                version = code_version(func)
+            self._versions[uri] = version
+        return version
+
+    def solve(self, uri, payload):
+        """Perform Solve on given uri"""
+        if uri != self.SOLVE_ROUTE:
+            return super(PhysicsHops, self).solve(uri, payload)
+        # legacy /solve route, parse the payload only once
+        sample = Sample(len(payload))
+        data = json.loads(payload)
+        sample.decode = time.perf_counter() - sample.started
+        comp_uri = data["pointer"]
+        if not comp_uri.startswith(self.ROOT_ROUTE):
+            comp_uri = self.ROOT_ROUTE + comp_uri
+        comp = self._components.get(comp_uri)
+        if comp is None:
+            return False, self._return_with_err("Unknown Hops component url")
+        hlogger.info("Solving using legacy API: %s", comp)
+        return self._process_solve_request(comp, data, sample)
+
+    def multisolve(self, payload):
+        """Solve a list of /solve payloads, returns one json response
+
+        payload is {"solves": [<solve payload>, ...]}, the response is
+        {"results": [<solve response>, ...]} in the same order. a failed
+        solve shows its errors in its own result and does not stop the rest
+        """
+        solves = json.loads(payload)["solves"]
+        results = []
+        for data in solves:
+            try:
+                comp_uri = data.get("pointer", "")
+                if not comp_uri.startswith(self.ROOT_ROUTE):
+                    comp_uri = self.ROOT_ROUTE + comp_uri
+                comp = self._components.get(comp_uri)
+                if comp is None:
+                    results.append(self._return_with_err("Unknown Hops component url"))
+                    continue
+                _, result = self._process_solve_request(comp, data)
+            except (ValueError, KeyError, TypeError, AttributeError) as bad_solve:
+                # a malformed solve, e.g. not an object or without "values"
+                results.append(self._return_with_err(f"Bad solve payload: {bad_solve}"))
+                continue
+            results.append(result if isinstance(result, str) else _joined(result))
+        # the results are json already, join them instead of parsing them again
+        return '{"results": [' + ", ".join(results) + "]}"
+
+    def sweep(self, payload):
+        """Evaluate a component over the grid of its input ranges
+
+        payload is {"pointer": <uri>, "inputs": {<input name or nickname>:
+        <range or values, see sweep.axis_values>, ...}, "chunk": <points>,
+        "include_inputs": <bool>}. the component needs a vectorized
+        kernel (registered with batch=, every formula component has one).
+        inputs left out use their default. raises ValueError (or KeyError)
+        for a bad payload, else returns a generator of NDJSON lines: a
+        header, then the outputs of each chunk of grid points in order.
+        chunks are solved in the worker pool, all cores at once
+        """
+        data = json.loads(payload)
+        uri = "/" + data["pointer"].strip("/")
+        comp = self._components.get(uri)
+        if comp is None or uri not in self._kernels:
+            raise ValueError(f"{uri} has no vectorized kernel to sweep")
+        for param in comp.inputs:
+            if not isinstance(param, sweep.SWEEP_PARAMS):
+                raise ValueError(
+                    f"{uri} can not be swept, {param.name} is not a number, point or vector"
+                )
+        specs = dict(data["inputs"])
+        axis_specs = []
+        for param in comp.inputs:
+            key = param.name if param.name in specs else param.nickname
+            if key in specs:
+                axis_specs.append(specs.pop(key))
+            elif param.default is not inspect.Parameter.empty:
+                axis_specs.append(param.default)
+            else:
+                raise ValueError(f"No values for input {param.name}")
+        if specs:
+            raise ValueError(f"{uri} has no inputs {sorted(specs)}")
+        # sized from the specs, nothing is built for a grid that is too big
+        total = sweep.grid_size(axis_specs)
+        if total > sweep.MAX_POINTS:
+            raise ValueError(f"{total} grid points, at most {sweep.MAX_POINTS} are allowed")
+        axes = [sweep.axis_values(spec) for spec in axis_specs]
+        chunk = int(data.get("chunk", sweep.CHUNK_SIZE))
+        if not 0 < chunk <= sweep.MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk must be between 1 and {sweep.MAX_CHUNK_SIZE}")
+        input_names = [p.name for p in comp.inputs] if data.get("include_inputs") else None
+        return self._sweep_lines(comp, axes, total, chunk, input_names)
+
+    def _sweep_lines(self, comp, axes, total, chunk, input_names):
+        output_names = [p.name for p in comp.outputs]
+        yield json.dumps({
+            "pointer": comp.uri,
+            "inputs": [p.name for p in comp.inputs],
+            "outputs": output_names,
+            "shape": sweep.grid_shape(axes),
+            "count": total,
+            "chunk": chunk,
+        }) + "\n"
+        if not self.pool.enabled or total <= chunk:
+            kernel = self._kernels[comp.uri]
+            try:
+                for start in range(0, total, chunk):
+                    stop = min(start + chunk, total)
+                    args = sweep.grid_chunk(axes, start, stop)
+                    yield sweep.chunk_line(kernel, args, output_names, start, stop, input_names)
+            except Exception as ex:
+                yield sweep.error_line(f"Chunk from {start} failed: {ex!r}")
+            return
+
+        module = comp.handler.__module__
+        if not self.pool.running:
+            self.pool.start(module)
+        # a few chunks ahead per worker, sent back in order. each worker
+        # gets the inputs of its chunk, not the whole axes
+        pending = deque()
+        try:
+            for start in range(0, total, chunk):
+                stop = min(start + chunk, total)
+                args = sweep.grid_chunk(axes, start, stop)
+                pending.append(self.pool.submit(
+                    _sweep_in_worker, module, comp.uri, args, start, stop, input_names
+                ))
+                if len(pending) >= 2 * self.pool.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BrokenProcessPool as pool_ex:
+            self.pool.restart()
+            yield sweep.error_line(f"Worker process failed: {pool_ex}")
+        except Exception as ex:
+            # the headers are sent, so the error goes in the last line
+            yield sweep.error_line(f"Chunk failed: {ex!r}")
+        finally:
+            # the client went away or a chunk failed, drop the rest
+            for future in pending:
+                future.cancel()
+
+    def _process_solve_request(self, comp, payload, sample=None):
+        capture = self.profiler.start(comp.uri)
+        if capture is not None:
+            return self._profiled_solve(comp, payload, capture)
+        # payload is parsed once here and handed down as a dict
+        if isinstance(payload, (str, bytes)):
+            sample = Sample(len(payload))
+            data = json.loads(payload)
+            sample.decode = time.perf_counter() - sample.started
+        else:
+            data = payload
+            sample = sample or Sample()
+        sample.items = count_items(data["values"])
+
+        res, result = self._cached_solve(comp, data, sample)
+        if not isinstance(result, str):
+            return res, self._recorded_stream(comp, result, sample, res)
+        sample.bytes_out = len(result)
+        self.metrics.record(comp.uri, sample, res)
+        return res, result
+
+    def _profiled_solve(self, comp, payload, capture):
+        # solved right here, past the cache, coalescing and the worker
+        # pool, so the profile shows the real work of the component
+        sample = Sample()
+        try:
+            if isinstance(payload, (str, bytes)):
+                sample.bytes_in = len(payload)
+                data = capture.call("decode", json.loads, payload)
+                sample.decode = time.perf_counter() - sample.started
+            else:
+                data = payload
+            sample.items = count_items(data["values"])
+            res, result = self.solve_here(comp, data, sample, capture)
+            if not isinstance(result, str):
+                result = capture.call("encode", _joined, result)
+        finally:
+            self.profiler.finish(capture)
+        sample.bytes_out = len(result)
+        self.metrics.record(comp.uri, sample, res)
+        return res, result
+
+    def _recorded_stream(self, comp, chunks, sample, res):
+        # the streamed outputs are computed while they are sent, so their
+        # time counts as encoding and the metrics are recorded at the end
+        started = time.perf_counter()
+        try:
+            for chunk in chunks:
+                sample.bytes_out += len(chunk)
+                yield chunk
+        finally:
+            sample.encode += time.perf_counter() - started
+            self.metrics.record(comp.uri, sample, res)
+
+    def _cached_solve(self, comp, data, sample):
+        version = self._version(comp.uri) if self.cache.enabled else None
+        if version is None and not self.inflight.enabled:
+            return self._dispatch(comp, data, sample)
+
+        key = (comp.uri, version, data.get("encoding"), input_hash(data["values"]))
+        if version is not None:
+            result = self.cache.get(key)
+            if result is None:
+                # read from disk and sent as is, not kept in memory
+                result = self.store.get(key)
+            if result is not None:
+                sample.cached = True
+                return True, result
+
+        def solve():
+            res, result = self._dispatch(comp, data, sample)
+            # cached before the flight ends, so no later request misses both.
+            # streamed results are too big to keep and can only be read once
+            if version is not None and res and isinstance(result, str):
+                self.cache.put(key, result)
+                self.store.put(key, result)
+            return res, result
+
+        (res, result), shared = self.inflight.do(key, solve)
+        if not shared:
+            return res, result
+        if not isinstance(result, str):
+            # the stream belongs to the first request, solve this one again
+            return self._dispatch(comp, data, sample)
+        sample.coalesced = True
+        return res, result
+
+    def _dispatch(self, comp, data, sample):
+        # hand process components to the pool, solve the rest right here
+        if comp.uri not in self._process_uris or not self.pool.enabled:
+            return self.solve_here(comp, data, sample)
+        # the payload goes over as plain json data and the result comes
+        # back encoded, so no rhino3dm objects cross the process boundary
+        module = comp.handler.__module__
+        try:
+            if not self.pool.running:
+                self.pool.start(module)
+            future = self.pool.submit(_solve_in_worker, module, comp.uri, data)
+            res, result, stages = future.result()
+        except BrokenProcessPool as pool_ex:
+            self.pool.restart()
+            return False, self._return_with_err(f"Worker process failed: {pool_ex}")
+        sample.add_stages(stages)
+        return res, result
+
+    def solve_here(self, comp, data, sample, capture=NO_CAPTURE):
+        """Solve in this process, skipping the cache and the worker pool
+
+        same as HopsBase._process_solve_request, timing each stage in sample
+        and profiling them in capture
+        """
+        started = time.perf_counter()
+        res, inputs = capture.call("decode", self._prepare_inputs, comp, data)
+        decoded = time.perf_counter()
+        sample.decode += decoded - started
+        if not res:
+            hlogger.debug("Bad inputs: %s", inputs)
+            return res, self._return_with_err("Bad inputs")
+
+        try:
+            solve_returned = capture.call("compute", self._solve, comp, inputs)
+            solved = time.perf_counter()
+            sample.compute += solved - decoded
+            hlogger.debug("Return data: %s", solve_returned)
+            res, outputs = capture.call(
+                "encode", self._prepare_outputs, comp, solve_returned, data.get("encoding")
+            )
+            sample.encode += time.perf_counter() - solved
+            return (
+                res,
+                outputs if res else self._return_with_err("Bad outputs"),
+            )
+        except Exception as solve_ex:
+            # try to grab traceback data and create err msg
+            _, _, exc_traceback = sys.exc_info()
+            try:
+                fmt_tb = traceback.format_tb(exc_traceback)
+                # skip solve_here, capture.call and _solve, start at the handler
+                ex_msg = "\n".join(fmt_tb[3:])
+                ex_msg = str(solve_ex) + f"\n{ex_msg}"
+            except Exception:
+                # otherwise use exception str as msg
+                ex_msg = str(solve_ex)
+
+            hlogger.debug("Exception occured in handler: %s", ex_msg)
+            return False, self._return_with_err(
+                "Exception occured in handler:\n%s" % ex_msg
+            )
+
+    def start_pool(self):
+        """Start the worker pool ahead of the first process component solve"""
+        modules = {self._components[uri].handler.__module__ for uri in self._process_uris}
+        if self.pool.enabled and modules:
+            self.pool.start(modules.pop())
+
+    def _prepare_inputs(self, comp, payload):
+        data = json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+        if comp.uri in self._array_uris:
+            try:
+                return True, codec.decode_inputs(comp.inputs, data["values"])
+            except (KeyError, ValueError) as decode_ex:
+                return False, str(decode_ex)
+
+        # same as HopsBase._prepare_inputs, minus parsing the payload again
+        try:
+            values = codec.expand_blocks(comp.inputs, data["values"])
+        except ValueError as decode_ex:
+            return False, str(decode_ex)
+        param_values = {}
+        for item in values:
+            param_values[item["ParamName"]] = item
+
+        inputs = []
+        for in_param in comp.inputs:
+            if in_param.name not in param_values and not in_param.optional:
+                return (
+                    False,
+                    f"Missing value for required input {in_param.name}",
+                )
+            in_param_data = param_values[in_param.name]
+            value = codec.from_input(in_param, in_param_data)
+            inputs.append(value)
+
+        if len(comp.inputs) != len(param_values):
+            return (
+                False,
+                "Input count does not match number of inputs for component",
+            )
+
+        return True, inputs
+
+    def _prepare_outputs(self, comp, returns, encoding=None):
+        # only array components answer in the compact encoding, the rest
+        # fall back to standard items
+        if comp.uri not in self._array_uris:
+            return super(PhysicsHops, self)._prepare_outputs(comp, returns)
+        values = returns if isinstance(returns, tuple) else (returns,)
+        if any(codec.is_streamed(value) for value in values):
+            return True, codec.stream_outputs(comp.outputs, returns, encoding)
+        return True, codec.encode_outputs(comp.outputs, returns, encoding)
+
+    def handle_POST(self, request):
+        # same as HopsFlask.handle_POST, except that streamed results are
+        # sent chunk by chunk as they are made instead of as one string
+        if self._is_comp_uri(request.path):
+            return self._return_method_not_allowed()
+        res, results = self.solve(uri=request.path, payload=request.data)
+        return self._prep_response(200 if res else 404, results)
@@ -0,0 +1,67 @@
+"""Panelization of point grids into ruled surfaces or one quad mesh"""
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+rhino3dm = lazy_import("rhino3dm")
+
+
+# surfaces built and encoded per streamed chunk
+CHUNK_SIZE = 1000
+
+
+def grid_quads(count, columns):
+    """Corner indices A B C D of every panel of a row by row point grid
+
+    A->B is the panel edge along a row, C->D the same edge on the next row
+    """
+    if columns < 2 or count % columns or count // columns < 2:
+        raise ValueError(
+            f"{count} points do not make a grid of rows of {columns} points"
+        )
+    rows = count // columns
+    index = np.arange(count).reshape(rows, columns)
+    a = index[:-1, :-1]
+    b = index[:-1, 1:]
+    c = index[1:, :-1]
+    d = index[1:, 1:]
+    return np.stack([a, b, c, d], axis=-1).reshape(-1, 4)
+
+
+def panel_quads(count, columns, quads):
+    """Panels from explicit quads (4 indices each) or else from a grid"""
+    quads = np.asarray(quads, dtype=np.int64)
+    if not len(quads):
+        return grid_quads(count, int(columns))
+    if len(quads) % 4:
+        raise ValueError("Quads need 4 corner indices per panel")
+    quads = quads.reshape(-1, 4)
+    if quads.min() < 0 or quads.max() >= count:
+        raise ValueError(f"Quad corner indices must be between 0 and {count - 1}")
+    return quads
+
+
+def ruled_surfaces(points, quads, chunk_size=CHUNK_SIZE):
+    """Ruled surface of each panel, yielded chunk_size surfaces at a time
+
+    same surfaces as srf4pt: ruled between the lines A->B and C->D
+    """
+    xyz = np.asarray(points, dtype=np.float64).reshape(-1, 3).tolist()
+    quads = quads.tolist()
+    for start in range(0, len(quads), chunk_size):
+        chunk = []
+        for a, b, c, d in quads[start:start + chunk_size]:
+            edge1 = rhino3dm.LineCurve(rhino3dm.Point3d(*xyz[a]), rhino3dm.Point3d(*xyz[b]))
+            edge2 = rhino3dm.LineCurve(rhino3dm.Point3d(*xyz[c]), rhino3dm.Point3d(*xyz[d]))
+            chunk.append(rhino3dm.NurbsSurface.CreateRuledSurface(edge1, edge2))
+        yield chunk
+
+
+def quad_mesh(points, quads):
+    """One mesh with a quad face per panel, no NURBS involved"""
+    mesh = rhino3dm.Mesh()
+    for x, y, z in np.asarray(points, dtype=np.float64).reshape(-1, 3).tolist():
+        mesh.Vertices.Add(x, y, z)
+    # faces go around the panel: A B D C
+    for a, b, c, d in quads.tolist():
+        mesh.Faces.AddFace(a, b, d, c)
+    return mesh
@@ -0,0 +1,125 @@
+"""Chains of registered components solved as one component"""
+import hashlib
+import inspect
+
+from pool import from_worker
+
+
+class Pipeline:
+    """Solves a DAG of components, passing values between them in memory
+
+    components: the registered HopsComponents of each step, by uri
+    inputs: nicknames of the pipeline inputs
+    steps: {step name: (component uri, {component input name: source})}
+           where a source is a pipeline input nickname or
+           "<step name>.<component output name>"
+    returns: one source per pipeline output
+    submit: submit(component, args) -> Future of a step run in the worker
+            pool, with its result encoded by pool.to_worker, or None to run
+            the step here
+    process_uris: components whose steps go to submit
+
+    the step handlers are called directly, so intermediate values are never
+    encoded. the steps are short and hold the GIL, so they run one after
+    the other in the request thread, except for process components: those
+    of a level go to the worker pool first and run while the rest do.
+    """
+
+    def __init__(self, components, inputs, steps, returns, submit=None, process_uris=()):
+        self.inputs = tuple(inputs)
+        self.submit = submit
+        self.returns = tuple(returns)
+        self.spec = repr((self.inputs, sorted(steps.items()), self.returns))
+        self._steps = {}
+        for step, (uri, wiring) in steps.items():
+            if "." in step:
+                raise ValueError(f"Pipeline step name {step!r} can not contain '.'")
+            comp = components.get(uri)
+            if comp is None:
+                raise ValueError(f"Pipeline step {step!r} uses unknown component {uri}")
+            sources = []
+            for param in comp.inputs:
+                if param.name not in wiring:
+                    raise ValueError(f"Pipeline step {step!r} has no source for {param.name}")
+                sources.append(wiring[param.name])
+            unknown = set(wiring) - {param.name for param in comp.inputs}
+            if unknown:
+                raise ValueError(f"Component {uri} has no inputs {sorted(unknown)}")
+            outputs = [f"{step}.{param.name}" for param in comp.outputs]
+            self._steps[step] = (comp, sources, outputs)
+        self.levels = self._levels()
+        # steps of process components, solved in the worker pool
+        self._remote = {
+            step for step, (comp, _, _) in self._steps.items() if comp.uri in process_uris
+        }
+
+        available = set(self.inputs)
+        for _, _, outputs in self._steps.values():
+            available.update(outputs)
+        for source in self.returns:
+            if source not in available:
+                raise ValueError(f"Pipeline returns unknown value {source!r}")
+
+    @property
+    def step_uris(self):
+        return [comp.uri for comp, _, _ in self._steps.values()]
+
+    def _levels(self):
+        # group the steps into levels that only depend on earlier levels
+        available = set(self.inputs)
+        remaining = dict(self._steps)
+        levels = []
+        while remaining:
+            level = [
+                step for step, (_, sources, _) in remaining.items()
+                if all(source in available for source in sources)
+            ]
+            if not level:
+                raise ValueError(
+                    f"Pipeline steps {sorted(remaining)} have unknown or circular sources"
+                )
+            for step in level:
+                available.update(remaining.pop(step)[2])
+            levels.append(level)
+        return levels
+
+    def version(self, step_versions):
+        """Code version of the pipeline from the versions of its steps"""
+        code = self.spec + "".join(step_versions)
+        return hashlib.sha1(code.encode("utf-8")).hexdigest()[:16]
+
+    def signature(self):
+        return inspect.Signature(
+            [
+                inspect.Parameter(f"arg{i}", inspect.Parameter.POSITIONAL_OR_KEYWORD)
+                for i in range(len(self.inputs))
+            ]
+        )
+
+    def _run_step(self, step, values):
+        comp, sources, _ = self._steps[step]
+        return self._outputs(step, comp.handler(*(values[source] for source in sources)))
+
+    def _outputs(self, step, returned):
+        if not isinstance(returned, tuple):
+            returned = (returned,)
+        return dict(zip(self._steps[step][2], returned))
+
+    def __call__(self, *args):
+        values = dict(zip(self.inputs, args))
+        for level in self.levels:
+            futures = {}
+            if self.submit is not None:
+                for step in level:
+                    if step in self._remote:
+                        comp, sources, _ = self._steps[step]
+                        future = self.submit(comp, [values[source] for source in sources])
+                        if future is not None:
+                            futures[step] = future
+            for step in level:
+                if step not in futures:
+                    values.update(self._run_step(step, values))
+            for step, future in futures.items():
+                values.update(self._outputs(step, from_worker(future.result())))
+        returned = tuple(values[source] for source in self.returns)
+        return returned if len(returned) > 1 else returned[0]
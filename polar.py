@@ -0,0 +1,47 @@
+"""Polar <-> Cartesian conversion of whole arrays
+
+lengths, angles, x and y are numbers or arrays of any (matching) shape.
+angles are in radians, or in degrees with degrees=True, which may also
+be one flag per angle
+"""
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def to_radians(angles, degrees=False):
+    """Angles in radians, converting the ones flagged as degrees"""
+    angles = np.asarray(angles, dtype=np.float64)
+    if np.ndim(degrees) == 0:
+        return np.radians(angles) if degrees else angles
+    return np.where(degrees, np.radians(angles), angles)
+
+
+def from_radians(angles, degrees=False):
+    """Angles in radians given back in degrees where flagged"""
+    if np.ndim(degrees) == 0:
+        return np.degrees(angles) if degrees else angles
+    return np.where(degrees, np.degrees(angles), angles)
+
+
+def sincos(angles, degrees=False):
+    """Sine and cosine of every angle, each evaluated once"""
+    radians = to_radians(angles, degrees)
+    return np.sin(radians), np.cos(radians)
+
+
+def to_cartesian(lengths, angles, degrees=False):
+    """x and y components of vectors of lengths at angles from +x"""
+    sin, cos = sincos(angles, degrees)
+    lengths = np.asarray(lengths, dtype=np.float64)
+    return lengths * cos, lengths * sin
+
+
+def to_polar(x, y, degrees=False):
+    """Length and angle from +x of vectors with components x and y
+
+    the angle comes from atan2, so it is right in every quadrant
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return np.hypot(x, y), from_radians(np.arctan2(y, x), degrees)
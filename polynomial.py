@@ -0,0 +1,93 @@
+"""Values, derivatives and integrals of polynomials and expressions of t
+
+polynomials are given by their coefficients, constant term first:
+[1, 2, 3] is 1 + 2*t + 3*t**2. expressions are formula.py expressions of t
+"""
+import functools
+
+import formula
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def horner(coefficients, t):
+    """Polynomial at every t, by Horner's method over the whole array"""
+    t = np.asarray(t, dtype=np.float64)
+    result = np.zeros_like(t)
+    for coefficient in coefficients[::-1]:
+        result *= t
+        result += coefficient
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def derivative(coefficients, order=1):
+    """Coefficients of the order-th derivative, coefficients is a tuple"""
+    for _ in range(order):
+        coefficients = tuple(i * c for i, c in enumerate(coefficients))[1:]
+    return coefficients or (0.0,)
+
+
+@functools.lru_cache(maxsize=256)
+def integral(coefficients):
+    """Coefficients of the integral from 0, coefficients is a tuple"""
+    return (0.0,) + tuple(c / (i + 1) for i, c in enumerate(coefficients))
+
+
+def evaluate_polynomial(coefficients, t):
+    """Value, first and second derivative and integral from 0 at every t"""
+    coefficients = tuple(float(c) for c in coefficients)
+    return (
+        horner(coefficients, t),
+        horner(derivative(coefficients, 1), t),
+        horner(derivative(coefficients, 2), t),
+        horner(integral(coefficients), t),
+    )
+
+
+# longest expression accepted from a request
+MAX_EXPRESSION = 1000
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression):
+    """Kernel f(t) of an expression, compiled once per distinct expression"""
+    if len(expression) > MAX_EXPRESSION:
+        raise ValueError(f"Expression is longer than {MAX_EXPRESSION} characters")
+    return formula.make_kernel(
+        "expression", (f"y = {expression}",), ("t",), ("y",), register_source=False
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _gauss_legendre(points):
+    return np.polynomial.legendre.leggauss(points)
+
+
+def _apply(kernel, t):
+    # constant expressions return a scalar, give them the shape of t
+    return np.broadcast_to(kernel(t), np.shape(t)).astype(np.float64)
+
+
+def evaluate_expression(expression, t, quadrature_points=16):
+    """Value, first and second derivative and integral from 0 at every t
+
+    derivatives are central differences, the integral is Gauss-Legendre
+    quadrature over [0, t] (exact for polynomials up to degree 31)
+    """
+    kernel = compile_expression(expression)
+    t = np.asarray(t, dtype=np.float64)
+    scale = np.maximum(np.abs(t), 1.0)
+    # steps near the cube and fourth root of the float64 epsilon
+    h1 = 6e-6 * scale
+    h2 = 1e-4 * scale
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = _apply(kernel, t)
+        first = (_apply(kernel, t + h1) - _apply(kernel, t - h1)) / (2.0 * h1)
+        second = (_apply(kernel, t + h2) - 2.0 * value + _apply(kernel, t - h2)) / (h2 * h2)
+        nodes, weights = _gauss_legendre(quadrature_points)
+        half = 0.5 * t[:, None]
+        samples = _apply(kernel, half * (nodes + 1.0))
+        area = half[:, 0] * (samples @ weights)
+    return value, first, second, area
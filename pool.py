@@ -0,0 +1,133 @@
+"""Pool of warm worker processes for CPU bound components"""
+import concurrent.futures
+import importlib
+import multiprocessing
+import os
+import threading
+
+from lazy import lazy_import
+
+rhino3dm = lazy_import("rhino3dm")
+
+
+# rhino3dm value types sent to workers as their coordinates
+_COORDINATES = {
+    "Point2d": ("X", "Y"),
+    "Point3d": ("X", "Y", "Z"),
+    "Point3f": ("X", "Y", "Z"),
+    "Vector2d": ("X", "Y"),
+    "Vector3d": ("X", "Y", "Z"),
+    "Vector3f": ("X", "Y", "Z"),
+}
+
+
+class _Encoded:
+    # a rhino3dm value on its way to or from a worker process
+    __slots__ = ("kind", "data")
+
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
+
+
+def to_worker(value):
+    """value with its rhino3dm objects encoded, which can not be pickled
+
+    goes into lists, tuples and dicts (data trees). raises TypeError for
+    rhino3dm values that can not be encoded
+    """
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_worker(item) for item in value)
+    if isinstance(value, dict):
+        return {key: to_worker(item) for key, item in value.items()}
+    if not type(value).__module__.startswith("rhino3dm"):
+        return value
+    kind = type(value).__name__
+    if kind in _COORDINATES:
+        return _Encoded(kind, tuple(getattr(value, axis) for axis in _COORDINATES[kind]))
+    if isinstance(value, rhino3dm.CommonObject):
+        return _Encoded(None, value.Encode())
+    raise TypeError(f"Can not send a {kind} to a worker process")
+
+
+def from_worker(value):
+    """value sent by to_worker, with its rhino3dm objects decoded"""
+    if isinstance(value, (list, tuple)):
+        return type(value)(from_worker(item) for item in value)
+    if isinstance(value, dict):
+        return {key: from_worker(item) for key, item in value.items()}
+    if not isinstance(value, _Encoded):
+        return value
+    if value.kind is None:
+        return rhino3dm.CommonObject.Decode(value.data)
+    return getattr(rhino3dm, value.kind)(*value.data)
+
+
+def _noop():
+    return os.getpid()
+
+
+class WorkerPool:
+    """Process pool that is started once and kept warm
+
+    every worker imports the module the components live in when it starts,
+    so a solve sent to it only pays for the solve itself.
+    workers defaults to the HOPS_POOL_WORKERS env var (one per CPU core,
+    serve.py lowers it to share the cores between gunicorn workers),
+    0 runs everything in the request thread instead.
+    """
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = int(
+                os.environ.get("HOPS_POOL_WORKERS", multiprocessing.cpu_count())
+            )
+        self.workers = workers
+        self.module = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self, module):
+        """Start all workers and wait until they have imported module"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self.module = module
+            # spawn, not fork: the server is multithreaded and forking it
+            # could copy locks held by other request threads
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=importlib.import_module,
+                initargs=(module,),
+            )
+            warmups = [self._executor.submit(_noop) for _ in range(self.workers)]
+        concurrent.futures.wait(warmups)
+
+    def submit(self, fn, *args):
+        """Run fn(*args) in a worker process, returns a Future"""
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError("Worker pool is not running")
+        return executor.submit(fn, *args)
+
+    def restart(self):
+        """Drop a broken pool, the next submit starts a new one"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,122 @@
+"""Profiles of the next few solves of a component, switched on at runtime
+
+armed with Profiler.arm (the /profile route) or the HOPS_PROFILE env var,
+e.g. HOPS_PROFILE="/pointat:5,/graphical_method_02:3". every profiled
+request writes one cProfile .pstats file per stage: request decode,
+component function and response encode
+"""
+import cProfile
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+
+
+STAGES = ("decode", "compute", "encode")
+
+
+def parse_spec(spec):
+    """{uri: requests} of "<uri>[:<requests>],...", requests defaults to 1"""
+    armed = {}
+    for part in (spec or "").split(","):
+        uri, _, count = part.strip().partition(":")
+        if uri:
+            armed["/" + uri.strip("/")] = int(count or 1)
+    return armed
+
+
+class Capture:
+    """cProfile profiles of one request, one per stage"""
+
+    def __init__(self, uri):
+        self.uri = uri
+        self.started = time.time()
+        self.profiles = {stage: cProfile.Profile() for stage in STAGES}
+
+    def call(self, stage, func, *args):
+        """func(*args), profiled as part of stage"""
+        profile = self.profiles[stage]
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+
+    def save(self, directory):
+        """Write <uri>-<time>-<stage>.pstats files, returns their paths"""
+        name = re.sub(r"\W", "_", self.uri.strip("/"))
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        stamp += f"{self.started % 1:.3f}"[1:]
+        paths = []
+        for stage, profile in self.profiles.items():
+            path = os.path.join(directory, f"{name}-{stamp}-{stage}.pstats")
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+class _NoCapture:
+    # stands in for a Capture when the request is not profiled
+    @staticmethod
+    def call(stage, func, *args):
+        return func(*args)
+
+
+NO_CAPTURE = _NoCapture()
+
+
+class Profiler:
+    """Thread safe switch that profiles the next requests of components
+
+    one request is profiled at a time, requests that come in meanwhile
+    are solved as usual and do not use up the count
+    """
+
+    def __init__(self, directory=None, spec=None):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "hops_profiles")
+        # uri -> requests left to profile
+        self._armed = parse_spec(spec)
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self.files = deque(maxlen=60)
+
+    def arm(self, uri, requests=1):
+        """Profile the next requests solves of uri, 0 stops"""
+        with self._lock:
+            if requests > 0:
+                self._armed[uri] = requests
+            else:
+                self._armed.pop(uri, None)
+
+    def start(self, uri):
+        """Capture for this request of uri, or None if it is not profiled"""
+        if uri not in self._armed:
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        with self._lock:
+            left = self._armed.get(uri, 0)
+            if left > 1:
+                self._armed[uri] = left - 1
+            else:
+                self._armed.pop(uri, None)
+        if left < 1:
+            self._busy.release()
+            return None
+        return Capture(uri)
+
+    def finish(self, capture):
+        """Write the profiles of a finished request"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.files.extend(capture.save(self.directory))
+        finally:
+            self._busy.release()
+
+    def stats(self):
+        """Armed components and the latest profile files"""
+        with self._lock:
+            armed = dict(self._armed)
+        return {"directory": self.directory, "armed": armed, "files": list(self.files)}
@@ -0,0 +1,145 @@
+"""Production server for the Hops app
+
+Runs app.py with several worker processes, each with a pool of threads,
+instead of the single process Flask development server:
+
+    python serve.py --workers 4 --threads 8 --port 5000
+
+Uses gunicorn where it is available (Linux/macOS, pip install gunicorn).
+On Windows gunicorn does not run, so it falls back to waitress
+(pip install waitress), which serves with threads in a single process.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+
+def _default_workers():
+    # physics components are CPU bound, one worker per core
+    return int(os.environ.get("HOPS_WORKERS", multiprocessing.cpu_count()))
+
+
+def _default_threads():
+    return int(os.environ.get("HOPS_THREADS", 4))
+
+
+def _default_pool_workers(workers):
+    # every gunicorn worker has its own geometry pool, so together they
+    # get one process per core instead of one per core each
+    return max(1, multiprocessing.cpu_count() // max(workers, 1))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("HOPS_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("HOPS_PORT", 5000))
+    )
+    parser.add_argument(
+        "--workers", type=int, default=_default_workers(),
+        help="worker processes (HOPS_WORKERS, default: one per CPU core)",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=_default_threads(),
+        help="threads per worker (HOPS_THREADS, default: 4)",
+    )
+    parser.add_argument(
+        "--timeout", type=int, default=120,
+        help="seconds a solve may take before its worker is restarted",
+    )
+    parser.add_argument(
+        "--graceful-timeout", type=int, default=30,
+        help="seconds running solves get to finish on shutdown",
+    )
+    parser.add_argument(
+        "--server", choices=("auto", "gunicorn", "waitress"), default="auto",
+    )
+    return parser.parse_args(argv)
+
+
+def load_app():
+    """Import app.py once, which registers every component"""
+    from app import app
+
+    return app
+
+
+def start_pool():
+    """Warm up the worker processes of the geometry components"""
+    from app import hops
+
+    hops.start_pool()
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class HopsApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super(HopsApplication, self).__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+    def post_worker_init(worker):
+        # each gunicorn worker starts its own warm geometry pool
+        start_pool()
+
+    # read by the pools when load() imports app.py
+    os.environ.setdefault("HOPS_POOL_WORKERS", str(_default_pool_workers(args.workers)))
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        # import app.py in the master so every worker forks warm,
+        # with all components already registered
+        "preload_app": True,
+        "post_worker_init": post_worker_init,
+    }
+    HopsApplication(options).run()
+
+
+def run_waitress(args):
+    import waitress
+
+    if args.workers > 1:
+        print("waitress runs a single process, serving with threads only")
+    app = load_app()
+    start_pool()
+    # waitress finishes running requests on Ctrl+C / SIGTERM
+    waitress.serve(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads * max(args.workers, 1),
+        channel_timeout=args.timeout,
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = args.server
+    if server == "auto":
+        server = "waitress" if sys.platform == "win32" else "gunicorn"
+    try:
+        __import__(server)
+    except ImportError:
+        sys.exit(f"{server} is not installed, run: pip install {server}")
+    if server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Time stepping of many particles at once with NumPy
+
+every particle feels the same gravity along -Z, its own constant force and
+quadratic air drag (drag * |v| * v against the motion), all divided by mass.
+the state lives in Nx3 buffers that are allocated once and updated in place
+"""
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+rhino3dm = lazy_import("rhino3dm")
+
+
+METHODS = ("euler", "semi-implicit", "rk4")
+
+
+class Particles:
+    """Positions and velocities of N particles, stepped in place
+
+    positions, velocities: Nx3 arrays
+    force: Nx3 (or 1x3) constant force on each particle, None for no force
+    """
+
+    def __init__(self, positions, velocities, gravity=9.81, drag=0.0, mass=1.0, force=None):
+        self.position = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        self.velocity = np.array(velocities, dtype=np.float64).reshape(-1, 3)
+        if self.position.shape != self.velocity.shape:
+            raise ValueError("Need one velocity per particle")
+        if mass <= 0:
+            raise ValueError("Mass must be positive")
+        count = len(self.position)
+        # everything but the drag does not change while stepping
+        self.constant = np.zeros((count, 3))
+        if force is not None and len(force):
+            self.constant += np.asarray(force, dtype=np.float64).reshape(-1, 3) / mass
+        self.constant[:, 2] -= gravity
+        self.drag = drag / mass
+        # scratch buffers, reused by every step
+        self._speed = np.empty(count)
+        self._delta = np.empty((count, 3))
+        self._kx = np.empty((4, count, 3))
+        self._kv = np.empty((4, count, 3))
+        self._v = np.empty((count, 3))
+
+    def __len__(self):
+        return len(self.position)
+
+    def acceleration(self, velocity, out):
+        """Acceleration of every particle at velocity, written to out"""
+        if not self.drag:
+            out[...] = self.constant
+            return out
+        np.einsum("ij,ij->i", velocity, velocity, out=self._speed)
+        np.sqrt(self._speed, out=self._speed)
+        np.multiply(velocity, self._speed[:, None], out=out)
+        out *= -self.drag
+        out += self.constant
+        return out
+
+    def step_euler(self, dt):
+        acceleration = self.acceleration(self.velocity, self._kv[0])
+        np.multiply(self.velocity, dt, out=self._delta)
+        self.position += self._delta
+        acceleration *= dt
+        self.velocity += acceleration
+
+    def step_semi_implicit(self, dt):
+        # velocity first, then move with the new velocity
+        acceleration = self.acceleration(self.velocity, self._kv[0])
+        acceleration *= dt
+        self.velocity += acceleration
+        np.multiply(self.velocity, dt, out=self._delta)
+        self.position += self._delta
+
+    def step_rk4(self, dt):
+        kx, kv, v = self._kx, self._kv, self._v
+        kx[0] = self.velocity
+        self.acceleration(kx[0], kv[0])
+        for stage, fraction in ((1, 0.5), (2, 0.5), (3, 1.0)):
+            # v = velocity + fraction * dt * kv[stage - 1]
+            np.multiply(kv[stage - 1], fraction * dt, out=v)
+            v += self.velocity
+            kx[stage] = v
+            self.acceleration(v, kv[stage])
+        for k, delta in ((kx, self.position), (kv, self.velocity)):
+            # delta += dt / 6 * (k0 + 2 k1 + 2 k2 + k3)
+            np.add(k[1], k[2], out=self._delta)
+            self._delta *= 2.0
+            self._delta += k[0]
+            self._delta += k[3]
+            self._delta *= dt / 6.0
+            delta += self._delta
+
+    def run(self, steps, dt, method="semi-implicit", samples=50):
+        """Step steps times, returns the positions at samples + 1 evenly
+        spaced steps (first and last included) as a (N, samples + 1, 3) array
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, use one of {METHODS}")
+        step = getattr(self, "step_" + method.replace("-", "_"))
+        steps = max(int(steps), 0)
+        samples = max(min(int(samples), steps), 1)
+        sample_steps = np.linspace(0, steps, samples + 1).round().astype(int)
+        trajectory = np.empty((len(sample_steps), len(self), 3))
+        trajectory[0] = self.position
+        sample = 1
+        for index in range(1, steps + 1):
+            step(dt)
+            if index == sample_steps[sample]:
+                trajectory[sample] = self.position
+                sample += 1
+        if steps == 0:
+            trajectory[1:] = self.position
+        return trajectory.transpose(1, 0, 2)
+
+
+def polylines(trajectories):
+    """One rhino3dm PolylineCurve per particle trajectory"""
+    curves = []
+    for points in trajectories.tolist():
+        polyline = rhino3dm.Polyline(len(points))
+        for x, y, z in points:
+            polyline.Add(x, y, z)
+        curves.append(polyline.ToPolylineCurve())
+    return curves
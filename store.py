@@ -0,0 +1,195 @@
+"""On-disk store of solve results that outlives the server process"""
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+# bytes handed out per chunk when a stored result is read
+CHUNK_SIZE = 1 << 20
+# file with the version of the app that wrote the results
+VERSION_FILE = "VERSION"
+
+
+def _file_name(key):
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".json"
+
+
+class ResultStore:
+    """Thread safe LRU store of solve results, one file per result
+
+    directory: where the results are kept, None turns the store off
+    max_bytes: total size of the results, the least recently used are
+               deleted past it
+    version: version of the app writing the results. results written by
+             another version can never be hit again, so they are deleted
+             when the store is opened
+
+    results are read through mmap and handed out as bytes chunks, so a
+    large result goes from the page cache to the response without being
+    decoded into a Python string. several server processes can share a
+    directory: files are written atomically, and each process counts the
+    size of the files it knows about
+    """
+
+    def __init__(self, directory=None, max_bytes=1 << 30, version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.size = 0
+        # file name -> size, least recently used first
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            if version is not None:
+                self._check_version()
+            self._load()
+
+    def __len__(self):
+        return len(self._files)
+
+    @property
+    def enabled(self):
+        return bool(self.directory) and self.max_bytes > 0
+
+    def _check_version(self):
+        # drop the results of an older deploy
+        path = os.path.join(self.directory, VERSION_FILE)
+        try:
+            with open(path) as file:
+                stored = file.read().strip()
+        except OSError:
+            stored = None
+        if stored == self.version:
+            return
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        with open(path, "w") as file:
+            file.write(self.version)
+
+    def _load(self):
+        # pick up the results of earlier runs, oldest use first
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._files[name] = size
+            self.size += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Chunks (bytes) of the stored result for key, or None"""
+        if not self.enabled:
+            return None
+        name = _file_name(key)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                # deleted by another process
+                if name in self._files:
+                    self.size -= self._files.pop(name)
+            return None
+        with self._lock:
+            self.hits += 1
+            if name not in self._files:
+                # written by another process
+                self._files[name] = size
+                self.size += size
+            self._files.move_to_end(name)
+        try:
+            # keeps the use order across restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return self._chunks(mapped, size)
+
+    @staticmethod
+    def _chunks(mapped, size):
+        if mapped is None:
+            return
+        try:
+            for start in range(0, size, CHUNK_SIZE):
+                yield mapped[start:start + CHUNK_SIZE]
+        finally:
+            mapped.close()
+
+    def put(self, key, result):
+        """Store a result (str), replacing any stored for key"""
+        if not self.enabled:
+            return
+        data = result.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        name = _file_name(key)
+        # written aside and moved in place, so no reader sees half a file
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                file.write(data)
+            os.replace(temporary, os.path.join(self.directory, name))
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.writes += 1
+            self.size += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for name in self._files:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+            self._files.clear()
+            self.size = 0
+
+    def stats(self):
+        """Counters for reporting"""
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "version": self.version,
+            "files": len(self._files),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,124 @@
+"""Parameter sweeps: a component kernel over the grid of its input ranges
+
+every input is given as a range or a list of values, and the grid is
+every combination of them, the last input varying fastest. the grid is
+never sent or built whole: it is evaluated chunk by chunk from the flat
+point index, and each chunk becomes one line of NDJSON
+"""
+import json
+import math
+
+import codec
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+# input params a sweep can make values for
+SWEEP_PARAMS = codec.NUMBER_PARAMS + codec.INTEGER_PARAMS + codec.XYZ_PARAMS
+
+
+# grid points per chunk, and the largest chunk a request may ask for
+CHUNK_SIZE = 100_000
+MAX_CHUNK_SIZE = 1_000_000
+# grid points in one sweep
+MAX_POINTS = 100_000_000
+
+
+def axis_length(spec):
+    """Number of values of one input of the sweep, see axis_values
+
+    worked out from the spec alone, so the size of the grid is checked
+    before any of its inputs is built
+    """
+    if isinstance(spec, dict):
+        start = float(spec["start"])
+        stop = float(spec["stop"])
+        if "count" in spec:
+            count = int(spec["count"])
+            if count < 1:
+                raise ValueError("count must be at least 1")
+            return count
+        step = float(spec["step"])
+        if step == 0 or (stop - start) * step < 0:
+            raise ValueError(f"step {step} does not go from {start} to {stop}")
+        return math.floor((stop - start) / step + 1e-9) + 1
+    if isinstance(spec, (list, tuple)):
+        if not spec:
+            raise ValueError("An input of the sweep has no values")
+        return len(spec)
+    return 1
+
+
+def axis_values(spec):
+    """Values of one input of the sweep
+
+    spec: a number, a list of values (numbers or [x, y, z]),
+          {"start": a, "stop": b, "count": n} for n evenly spaced values
+          from a to b, or {"start": a, "stop": b, "step": s}, b included
+          if the steps land on it
+    """
+    count = axis_length(spec)
+    if isinstance(spec, dict):
+        start = float(spec["start"])
+        if "count" in spec:
+            return np.linspace(start, float(spec["stop"]), count)
+        return start + float(spec["step"]) * np.arange(count)
+    values = np.asarray(spec, dtype=np.float64)
+    return values.reshape(1) if values.ndim == 0 else values
+
+
+def grid_shape(axes):
+    return tuple(len(axis) for axis in axes)
+
+
+def grid_size(specs):
+    """Number of grid points of the input specs, before any is built"""
+    return math.prod(axis_length(spec) for spec in specs)
+
+
+def grid_chunk(axes, start, stop):
+    """Inputs at grid points start to stop (flat index, last axis fastest)"""
+    index = np.unravel_index(np.arange(start, stop), grid_shape(axes))
+    return [axis[i] for axis, i in zip(axes, index)]
+
+
+def chunk_line(kernel, args, output_names, start, stop, input_names=None):
+    """One NDJSON line with the outputs of grid points start to stop,
+    null where they are not finite (e.g. a division by zero)
+
+    args: the inputs at those points, from grid_chunk
+    input_names: also list the inputs of every point under these names
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returned = kernel(*args)
+    if not isinstance(returned, tuple):
+        returned = (returned,)
+    count = stop - start
+    line = {
+        "start": start,
+        "stop": stop,
+        "outputs": {
+            name: _json_values(codec.broadcast(value, count))
+            for name, value in zip(output_names, returned)
+        },
+    }
+    if input_names:
+        line["inputs"] = {name: _json_values(arg) for name, arg in zip(input_names, args)}
+    return json.dumps(line, allow_nan=False) + "\n"
+
+
+def error_line(message):
+    """The NDJSON line that ends a sweep that failed part way"""
+    return json.dumps({"errors": [message]}) + "\n"
+
+
+def _json_values(values):
+    # nested lists with null for inf and nan, which json has no numbers for
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if finite.all():
+        return values.tolist()
+    values = values.astype(object)
+    values[~finite] = None
+    return values.tolist()
@@ -0,0 +1,65 @@
+"""Shared fixtures: the app of app.py solved through the Flask test client"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# solve in the test process, without the result cache or the disk store
+os.environ["HOPS_POOL_WORKERS"] = "0"
+os.environ["HOPS_CACHE_SIZE"] = "0"
+os.environ.pop("HOPS_STORE_DIR", None)
+
+
+def number_tree(branches):
+    """InnerTree of numbers from {path: [values]}"""
+    return {
+        path: [{"type": "System.Double", "data": repr(float(value))} for value in values]
+        for path, values in branches.items()
+    }
+
+
+def output_tree(response, name):
+    """{path: [values]} of a number output of a solve response"""
+    for value in response["values"]:
+        if value["ParamName"] == name:
+            return {
+                path: [float(item["data"]) for item in items]
+                for path, items in value["InnerTree"].items()
+            }
+    raise KeyError(name)
+
+
+@pytest.fixture(scope="session")
+def hops():
+    from app import hops
+
+    return hops
+
+
+@pytest.fixture(scope="session")
+def client(hops):
+    from app import app
+
+    return app.test_client()
+
+
+@pytest.fixture
+def solve(client):
+    """POST /solve for pointer with {input name: {path: [numbers]}}"""
+
+    def post(pointer, inputs):
+        payload = {
+            "pointer": pointer,
+            "values": [
+                {"ParamName": name, "InnerTree": number_tree(branches)}
+                for name, branches in inputs.items()
+            ],
+        }
+        response = client.post("/solve", data=json.dumps(payload))
+        assert response.status_code == 200
+        return response.get_json()
+
+    return post
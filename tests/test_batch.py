@@ -0,0 +1,100 @@
+"""_batch twins give what Grasshopper gives solving the scalar component per item"""
+import json
+
+import numpy as np
+import pytest
+
+import codec
+from conftest import output_tree
+
+
+def scalar_per_item(solve, pointer, inputs, output):
+    # what Grasshopper does: match the trees branch by branch, longest list
+    # inside each branch, and solve the scalar component once per item
+    trees = [list(branches.values()) for branches in inputs.values()]
+    paths = list(max(inputs.values(), key=len))
+    result = {}
+    for b, path in enumerate(paths):
+        branches = [tree[min(b, len(tree) - 1)] for tree in trees]
+        count = max(len(branch) for branch in branches)
+        result[path] = []
+        for i in range(count):
+            items = {
+                name: {"{0}": [branch[min(i, len(branch) - 1)]]}
+                for name, branch in zip(inputs, branches)
+            }
+            # the scalar component answers in one branch, whatever its path
+            (values,) = output_tree(solve(pointer, items), output).values()
+            result[path].extend(values)
+    return result
+
+
+CASES = [
+    # several items per branch against one item per branch
+    {"Distance": {"{0}": [10, 20], "{1}": [30, 40]}, "Time": {"{0}": [1], "{1}": [10]}},
+    # fewer branches repeat the last branch
+    {"Distance": {"{0}": [10], "{1}": [30, 40, 50], "{2}": [60]}, "Time": {"{0}": [2, 4]}},
+    # the same layout
+    {"Distance": {"{0;0}": [1, 2], "{0;1}": [3]}, "Time": {"{0;0}": [4, 5], "{0;1}": [6]}},
+]
+
+
+@pytest.mark.parametrize("inputs", CASES)
+def test_batch_matches_scalar_per_item(solve, inputs):
+    batch = output_tree(solve("/average_speed_batch", inputs), "Speed")
+    assert batch == pytest.approx(scalar_per_item(solve, "/average_speed", inputs, "Speed"))
+
+
+def test_batch_pairs_items_within_their_branch(solve):
+    inputs = {"Distance": {"{0}": [10, 20], "{1}": [30, 40]}, "Time": {"{0}": [1], "{1}": [10]}}
+    batch = output_tree(solve("/average_speed_batch", inputs), "Speed")
+    assert batch == {"{0}": [10.0, 20.0], "{1}": [3.0, 4.0]}
+
+
+def test_match_branches_repeats_last_branch_and_item():
+    a = codec.Tree(["{0}", "{1}", "{2}"], [1, 3, 2], np.arange(6.0))
+    b = codec.Tree(["{0}"], [2], np.array([10.0, 20.0]))
+    paths, counts, (da, db) = codec.match_branches([a, b])
+    assert paths == ["{0}", "{1}", "{2}"]
+    assert counts == [2, 3, 2]
+    assert da.tolist() == [0, 0, 1, 2, 3, 4, 5]
+    assert db.tolist() == [10, 20, 10, 20, 20, 10, 20]
+
+
+def test_match_branches_points():
+    points = codec.Tree(["{0}", "{1}"], [1, 1], np.array([[1.0, 0, 0], [0, 1.0, 0]]))
+    scales = codec.Tree(["{0}", "{1}"], [2, 1], np.array([1.0, 2.0, 3.0]))
+    _, counts, (dp, ds) = codec.match_branches([points, scales])
+    assert counts == [2, 1]
+    assert dp.tolist() == [[1, 0, 0], [1, 0, 0], [0, 1, 0]]
+    assert ds.tolist() == [1, 2, 3]
+
+
+def test_match_branches_rejects_empty_input():
+    a = codec.Tree(["{0}", "{1}"], [1, 0], np.array([1.0]))
+    b = codec.Tree(["{0}", "{1}"], [1, 1], np.array([1.0, 2.0]))
+    with pytest.raises(ValueError):
+        codec.match_branches([a, b])
+
+
+def test_scalar_geometry_goes_through_geometry_cache(client):
+    rhino3dm = pytest.importorskip("rhino3dm")
+    line = rhino3dm.LineCurve(rhino3dm.Point3d(0, 0, 0), rhino3dm.Point3d(10, 0, 0))
+    curve = {"type": "Rhino.Geometry.LineCurve", "data": json.dumps(line.Encode())}
+    before = codec.geometry_cache.stats()
+    for t in (0.25, 0.75):
+        payload = {
+            "pointer": "/pointat",
+            "values": [
+                {"ParamName": "Curve", "InnerTree": {"{0}": [curve]}},
+                {"ParamName": "t", "InnerTree": {"{0}": [{"type": "System.Double", "data": str(t)}]}},
+            ],
+        }
+        response = client.post("/solve", data=json.dumps(payload))
+        assert response.status_code == 200
+        (item,) = response.get_json()["values"][0]["InnerTree"]["0"]
+        # a line curve is parameterized by length
+        assert json.loads(item["data"])["X"] == pytest.approx(t)
+    after = codec.geometry_cache.stats()
+    assert after["misses"] - before["misses"] <= 1
+    assert after["hits"] - before["hits"] >= 1
@@ -0,0 +1,81 @@
+"""SolveCache eviction and the code versions that keep cached results valid"""
+import pytest
+
+import cache
+from cache import SolveCache, modules_version
+
+
+def test_least_recently_used_is_evicted():
+    results = SolveCache(maxsize=2, ttl=0)
+    results.put("a", 1)
+    results.put("b", 2)
+    assert results.get("a") == 1
+    results.put("c", 3)
+    assert results.get("b") is None
+    assert results.get("a") == 1
+    assert results.get("c") == 3
+    assert results.stats()["evictions"] == 1
+
+
+def test_results_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    results = SolveCache(maxsize=10, ttl=60)
+    results.put("a", 1)
+    now[0] += 59
+    assert results.get("a") == 1
+    now[0] += 2
+    assert results.get("a") is None
+    assert len(results) == 0
+    assert results.stats()["expirations"] == 1
+
+
+def test_memory_limit_evicts_and_skips_big_results():
+    result = "x" * 1000
+    size = cache.sys.getsizeof(result)
+    results = SolveCache(maxsize=100, ttl=0, max_bytes=2 * size)
+    for key in "abc":
+        results.put(key, result)
+    assert results.get("a") is None
+    assert results.stats()["bytes"] == 2 * size
+    results.put("big", "x" * 10000)
+    assert results.get("big") is None
+    assert results.get("c") == result
+
+
+def test_size_zero_turns_the_cache_off():
+    results = SolveCache(maxsize=0)
+    results.put("a", 1)
+    assert results.get("a") is None
+    assert len(results) == 0
+
+
+@pytest.fixture
+def app_dir(tmp_path):
+    (tmp_path / "app.py").write_text("import helpers\n\ndef component(x):\n    return helpers.f(x)\n")
+    (tmp_path / "helpers.py").write_text("from lazy import lazy_import\nnp = lazy_import('numbers')\ndef f(x):\n    return x\n")
+    (tmp_path / "numbers.py").write_text("ONE = 1\n")
+    (tmp_path / "bench.py").write_text("import app\n")
+    modules_version.cache_clear()
+    yield tmp_path
+    modules_version.cache_clear()
+
+
+def changed(app_dir, name, text):
+    before = modules_version(str(app_dir / "app.py"))
+    (app_dir / name).write_text(text)
+    modules_version.cache_clear()
+    return modules_version(str(app_dir / "app.py")) != before
+
+
+def test_version_changes_with_imported_modules(app_dir):
+    assert changed(app_dir, "helpers.py", "def f(x):\n    return 2 * x\n")
+
+
+def test_version_changes_with_lazy_imported_modules(app_dir):
+    assert changed(app_dir, "numbers.py", "ONE = 2\n")
+
+
+def test_version_ignores_scripts_the_app_does_not_import(app_dir):
+    assert not changed(app_dir, "bench.py", "import app\nprint(app)\n")
+    assert not changed(app_dir, "loadgen.py", "import bench\n")
@@ -0,0 +1,65 @@
+"""ResultStore: results on disk across restarts and deploys"""
+from store import CHUNK_SIZE, ResultStore
+
+
+def read(store, key):
+    chunks = store.get(key)
+    return None if chunks is None else b"".join(chunks).decode("utf-8")
+
+
+def test_round_trip(tmp_path):
+    store = ResultStore(str(tmp_path), 1 << 20)
+    store.put(("/a", "1"), '{"values": []}')
+    assert read(store, ("/a", "1")) == '{"values": []}'
+    assert read(store, ("/a", "2")) is None
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+
+
+def test_large_result_comes_in_chunks(tmp_path):
+    store = ResultStore(str(tmp_path), 4 * CHUNK_SIZE)
+    result = "x" * (2 * CHUNK_SIZE + 10)
+    store.put("big", result)
+    chunks = list(store.get("big"))
+    assert [len(chunk) for chunk in chunks] == [CHUNK_SIZE, CHUNK_SIZE, 10]
+    assert b"".join(chunks).decode("utf-8") == result
+
+
+def test_results_outlive_the_store(tmp_path):
+    ResultStore(str(tmp_path), 1 << 20, version="v1").put("a", "result")
+    store = ResultStore(str(tmp_path), 1 << 20, version="v1")
+    assert len(store) == 1
+    assert read(store, "a") == "result"
+
+
+def test_new_version_wipes_results(tmp_path):
+    ResultStore(str(tmp_path), 1 << 20, version="v1").put("a", "result")
+    store = ResultStore(str(tmp_path), 1 << 20, version="v2")
+    assert len(store) == 0
+    assert read(store, "a") is None
+    assert (tmp_path / "VERSION").read_text() == "v2"
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_least_recently_used_is_deleted(tmp_path):
+    store = ResultStore(str(tmp_path), 25)
+    store.put("a", "a" * 10)
+    store.put("b", "b" * 10)
+    assert read(store, "a") == "a" * 10
+    store.put("c", "c" * 10)
+    assert read(store, "b") is None
+    assert read(store, "a") == "a" * 10
+    assert store.stats()["evictions"] == 1
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_too_big_results_are_not_stored(tmp_path):
+    store = ResultStore(str(tmp_path), 10)
+    store.put("a", "x" * 11)
+    assert read(store, "a") is None
+
+
+def test_without_directory_the_store_is_off():
+    store = ResultStore(None)
+    store.put("a", "result")
+    assert read(store, "a") is None
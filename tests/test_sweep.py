@@ -0,0 +1,100 @@
+"""/sweep: NDJSON lines of a component kernel over a grid of inputs"""
+import json
+
+import ghhops_server as hs
+import pytest
+
+import sweep
+
+
+def strict_lines(response):
+    # every line must be json without the NaN/Infinity extensions
+    def reject(token):
+        raise ValueError(f"{token} is not json")
+
+    return [json.loads(line, parse_constant=reject) for line in response.data.decode().splitlines()]
+
+
+def post(client, payload):
+    return client.post("/sweep", data=json.dumps(payload))
+
+
+def test_sweep_grid(client):
+    response = post(client, {
+        "pointer": "/average_speed",
+        "inputs": {"Distance": [10, 20], "Time": {"start": 1, "stop": 2, "count": 2}},
+        "include_inputs": True,
+    })
+    assert response.status_code == 200
+    header, line = strict_lines(response)
+    assert header["shape"] == [2, 2]
+    assert line["inputs"] == {"Distance": [10, 10, 20, 20], "Time": [1, 2, 1, 2]}
+    assert line["outputs"] == {"Speed": [10, 5, 20, 10]}
+
+
+def test_sweep_chunks_in_order(client):
+    response = post(client, {
+        "pointer": "/average_speed", "chunk": 3,
+        "inputs": {"Distance": {"start": 1, "stop": 10, "step": 1}, "Time": 1},
+    })
+    lines = strict_lines(response)[1:]
+    assert [(line["start"], line["stop"]) for line in lines] == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    assert sum((line["outputs"]["Speed"] for line in lines), []) == list(range(1, 11))
+
+
+def test_sweep_non_finite_outputs_are_null(client):
+    response = post(client, {"pointer": "/average_speed", "inputs": {"Distance": [1, 0], "Time": 0}})
+    _, line = strict_lines(response)
+    assert line["outputs"]["Speed"] == [None, None]
+
+
+def test_sweep_rejects_geometry_inputs(client):
+    response = post(client, {"pointer": "/pointat", "inputs": {"Curve": [0], "t": [0, 1]}})
+    assert response.status_code == 400
+    assert "Curve is not a number, point or vector" in response.get_json()["errors"][0]
+
+
+@pytest.mark.parametrize("inputs", [
+    {"Distance": [1]},
+    {"Distance": [1], "Time": [1], "Mass": [1]},
+    {"Distance": [], "Time": [1]},
+    {"Distance": {"start": 0, "stop": 1, "step": -1}, "Time": [1]},
+])
+def test_sweep_bad_payload(client, inputs):
+    response = post(client, {"pointer": "/average_speed", "inputs": inputs})
+    assert response.status_code == 400
+
+
+def test_sweep_too_big_is_refused_before_building(client):
+    huge = {"start": 0, "stop": 1, "count": sweep.MAX_POINTS}
+    response = post(client, {"pointer": "/average_speed", "inputs": {"Distance": huge, "Time": huge}})
+    assert response.status_code == 400
+    assert "grid points" in response.get_json()["errors"][0]
+
+
+def test_sweep_kernel_error_ends_with_error_line(hops, client):
+    def kernel(x):
+        if (x > 2).any():
+            raise ZeroDivisionError("x too big")
+        return x
+
+    @hops.component(
+        "/test_sweep_fails",
+        inputs=[hs.HopsNumber("x", "x")],
+        outputs=[hs.HopsNumber("y", "y")],
+        batch=kernel,
+    )
+    def fails(x: float):
+        return kernel(x)
+
+    response = post(client, {"pointer": "/test_sweep_fails", "chunk": 2, "inputs": {"x": [1, 2, 3, 4]}})
+    assert response.status_code == 200
+    header, first, error = strict_lines(response)
+    assert first["outputs"] == {"y": [1, 2]}
+    assert "x too big" in error["errors"][0]
+
+
+def test_axis_length_matches_axis_values():
+    for spec in (3.0, [1, 2, 3], [[0, 0, 1], [1, 0, 0]], {"start": 0, "stop": 1, "count": 5},
+                 {"start": 0, "stop": 1, "step": 0.25}, {"start": 1, "stop": 0, "step": -0.3}):
+        assert sweep.axis_length(spec) == len(sweep.axis_values(spec))
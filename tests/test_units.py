@@ -0,0 +1,91 @@
+"""Formula components with units: what registering accepts and refuses"""
+import itertools
+
+import ghhops_server as hs
+import numpy as np
+import pytest
+
+import formula
+import units
+
+_uris = itertools.count()
+
+
+def register(hops, formulas, names=("a", "b"), input_units=None, output_units=None):
+    """Register a formula on a new uri, returns its kernel"""
+    return hops.formula(
+        f"/test_formula_{next(_uris)}",
+        formulas,
+        name="test formula",
+        inputs=[hs.HopsNumber(name, name) for name in names],
+        outputs=[hs.HopsNumber("y", "y")],
+        input_units=input_units,
+        output_units=output_units,
+    )
+
+
+def test_units_convert_inputs_and_outputs(hops):
+    kernel = register(hops, "y = a * b", input_units={"a": "m/s", "b": "min"}, output_units={"y": "km"})
+    assert kernel(10.0, 2.0) == pytest.approx(1.2)
+
+
+def test_input_without_unit_is_a_plain_number(hops):
+    kernel = register(hops, "y = a * b", input_units={"a": "m"}, output_units={"y": "cm"})
+    assert kernel(2.0, 3.0) == pytest.approx(600.0)
+
+
+def test_output_without_unit_is_a_plain_number(hops):
+    kernel = register(hops, "y = a / b", input_units={"a": "m", "b": "km"})
+    assert kernel(3.0, 2.0) == pytest.approx(0.0015)
+
+
+def test_output_without_unit_needs_a_plain_number(hops):
+    with pytest.raises(ValueError, match="y has no unit"):
+        register(hops, "y = a * b", input_units={"a": "m/s", "b": "min"})
+
+
+def test_wrong_output_unit(hops):
+    with pytest.raises(ValueError, match="gives length"):
+        register(hops, "y = a * b", input_units={"a": "m/s", "b": "min"}, output_units={"y": "kg"})
+
+
+@pytest.mark.parametrize("text", ["y = a + b", "y = min(a, b)", "y = sqrt(a - b)"])
+def test_adding_different_dimensions(hops, text):
+    with pytest.raises(ValueError):
+        register(hops, text, input_units={"a": "m", "b": "s"}, output_units={"y": "m"})
+
+
+@pytest.mark.parametrize("text", ["y = sqrt()", "y = atan2(a)", "y = sin(a, b)", "y = c", "y = a.b"])
+def test_invalid_formula(hops, text):
+    with pytest.raises(ValueError, match="Invalid formula"):
+        register(hops, text, input_units={"a": "m", "b": "m"}, output_units={"y": "m"})
+
+
+def test_min_of_more_than_two_leaves_inputs_alone():
+    kernel = formula.compile_formula("test_min", ("y = min(a, b, c)",), ("a", "b", "c"), ("y",))
+    a, b, c = np.array([3.0, 1.0]), np.array([2.0, 5.0]), np.array([1.0, 9.0])
+    assert kernel(a, b, c).tolist() == [1.0, 1.0]
+    assert c.tolist() == [1.0, 9.0]
+
+
+def test_conversion():
+    assert units.conversion("km/h", "m/s") == pytest.approx(1 / 3.6)
+    assert units.convert([1.0, 2.0], "mi", "km").tolist() == pytest.approx([1.609344, 3.218688])
+    with pytest.raises(ValueError, match="Can not convert"):
+        units.conversion("m", "s")
+
+
+def test_squared_time_in_the_denominator(hops):
+    kernel = register(hops, "y = a / b**2", input_units={"a": "km", "b": "min"}, output_units={"y": "m/s^2"})
+    assert kernel(36.0, 1.0) == pytest.approx(10.0)
+
+
+@pytest.mark.parametrize("text", ["y = a * b**-2", "y = a * b**(-2)", "y = a / b**+2"])
+def test_negative_power(hops, text):
+    kernel = register(hops, text, input_units={"a": "m", "b": "s"}, output_units={"y": "m/s^2"})
+    assert kernel(8.0, 2.0) == pytest.approx(2.0)
+
+
+def test_negative_power_gives_the_wrong_unit(hops):
+    with pytest.raises(ValueError, match="gives"):
+        register(hops, "y = a * b**-1", input_units={"a": "m", "b": "s"}, output_units={"y": "m/s^2"})
@@ -0,0 +1,207 @@
+"""Units, conversion factors and dimension checks
+
+a unit is a product of the names in UNITS, each with an optional integer
+power, divided by others: "m", "km/h", "m/s^2", "kg*m/s**2", "1/s".
+"1" (or "") is a plain number. parsed units and conversion factors are
+cached, so converting an array costs one multiply
+"""
+import ast
+import functools
+import re
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+# dimensions are exponents of (length, mass, time)
+LENGTH = (1, 0, 0)
+MASS = (0, 1, 0)
+TIME = (0, 0, 1)
+NONE = (0, 0, 0)
+
+# name -> (factor to SI, dimension)
+UNITS = {
+    "m": (1.0, LENGTH),
+    "mm": (1e-3, LENGTH),
+    "cm": (1e-2, LENGTH),
+    "km": (1e3, LENGTH),
+    "in": (0.0254, LENGTH),
+    "ft": (0.3048, LENGTH),
+    "yd": (0.9144, LENGTH),
+    "mi": (1609.344, LENGTH),
+    "nmi": (1852.0, LENGTH),
+    "s": (1.0, TIME),
+    "ms": (1e-3, TIME),
+    "min": (60.0, TIME),
+    "h": (3600.0, TIME),
+    "day": (86400.0, TIME),
+    # 365 days, as in the textbook problems
+    "year": (365 * 86400.0, TIME),
+    "kg": (1.0, MASS),
+    "g": (1e-3, MASS),
+    "lb": (0.45359237, MASS),
+    "oz": (0.028349523125, MASS),
+    "N": (1.0, (1, 1, -2)),
+    "lbf": (4.4482216152605, (1, 1, -2)),
+    "J": (1.0, (2, 1, -2)),
+    "W": (1.0, (2, 1, -3)),
+    "mph": (1609.344 / 3600.0, (1, 0, -1)),
+    "kph": (1000.0 / 3600.0, (1, 0, -1)),
+    "knot": (1852.0 / 3600.0, (1, 0, -1)),
+    "rad": (1.0, NONE),
+    "deg": (3.141592653589793 / 180.0, NONE),
+}
+
+_TOKEN = re.compile(r"\s*([*/])?\s*([A-Za-z]+|1)\s*(?:(?:\^|\*\*)\s*(-?\d+))?\s*")
+
+
+def _scale(dimension, power):
+    return tuple(d * power for d in dimension)
+
+
+def _add(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def describe(dimension):
+    """Readable dimension, e.g. "length/time" """
+    names = ("length", "mass", "time")
+    up = [n if p == 1 else f"{n}^{p:g}" for n, p in zip(names, dimension) if p > 0]
+    down = [n if p == -1 else f"{n}^{-p:g}" for n, p in zip(names, dimension) if p < 0]
+    text = "*".join(up) or "1"
+    return text + ("/" + "/".join(down) if down else "")
+
+
+@functools.lru_cache(maxsize=None)
+def parse_unit(unit):
+    """(factor to SI, dimension) of a unit"""
+    unit = (unit or "").strip()
+    if unit in ("", "1"):
+        return 1.0, NONE
+    factor, dimension = 1.0, NONE
+    position = 0
+    while position < len(unit):
+        match = _TOKEN.match(unit, position)
+        if not match or match.end() == position or (position and not match.group(1)):
+            raise ValueError(f"Can not read unit {unit!r}")
+        operator, name, power = match.groups()
+        power = int(power or 1) * (-1 if operator == "/" else 1)
+        if name != "1":
+            if name not in UNITS:
+                raise ValueError(f"Unknown unit {name!r} in {unit!r}")
+            name_factor, name_dimension = UNITS[name]
+            factor *= name_factor ** power
+            dimension = _add(dimension, _scale(name_dimension, power))
+        position = match.end()
+    return factor, dimension
+
+
+@functools.lru_cache(maxsize=None)
+def conversion(from_unit, to_unit):
+    """Factor that converts values in from_unit into to_unit"""
+    from_factor, from_dimension = parse_unit(from_unit)
+    to_factor, to_dimension = parse_unit(to_unit)
+    if from_dimension != to_dimension:
+        raise ValueError(
+            f"Can not convert {from_unit} ({describe(from_dimension)}) "
+            f"to {to_unit} ({describe(to_dimension)})"
+        )
+    return from_factor / to_factor
+
+
+def convert(values, from_unit, to_unit):
+    """Values in from_unit converted to to_unit, one multiply for the array"""
+    return np.asarray(values, dtype=np.float64) * conversion(from_unit, to_unit)
+
+
+# formula functions that keep the dimension of their argument(s)
+_SAME_DIMENSION = ("abs", "min", "max", "hypot")
+
+
+def _constant_power(node):
+    # the value of a power written as a number, e.g. 2, -2 or +0.5, else None
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _constant_power(node.operand)
+        if value is None or isinstance(node.op, ast.UAdd):
+            return value
+        return -value
+    if isinstance(node, ast.Constant):
+        return node.value
+    return None
+
+
+def _dimension(node, dimensions, formula):
+    # dimension of a formula.py expression, given the dimension of each name
+    def fail(reason):
+        raise ValueError(f"Formula {formula!r}: {reason}")
+
+    if isinstance(node, ast.Expression):
+        return _dimension(node.body, dimensions, formula)
+    if isinstance(node, ast.Constant):
+        return NONE
+    if isinstance(node, ast.Name):
+        if node.id in ("pi", "e"):
+            return NONE
+        # inputs without a unit are plain numbers
+        return dimensions.get(node.id, NONE)
+    if isinstance(node, ast.UnaryOp):
+        return _dimension(node.operand, dimensions, formula)
+    if isinstance(node, ast.BinOp):
+        left = _dimension(node.left, dimensions, formula)
+        if isinstance(node.op, ast.Pow):
+            power = _constant_power(node.right)
+            if power is None:
+                if left != NONE:
+                    fail("only plain numbers can have a variable power")
+                return NONE
+            return _scale(left, power)
+        right = _dimension(node.right, dimensions, formula)
+        if isinstance(node.op, ast.Mult):
+            return _add(left, right)
+        if isinstance(node.op, ast.Div):
+            return _add(left, _scale(right, -1))
+        if left != right:
+            fail(f"can not add or compare {describe(left)} and {describe(right)}")
+        return left
+    if isinstance(node, ast.Call):
+        args = [_dimension(arg, dimensions, formula) for arg in node.args]
+        name = node.func.id
+        if name == "sqrt":
+            return _scale(args[0], 0.5)
+        if name in _SAME_DIMENSION:
+            if len(set(args)) > 1:
+                fail(f"{name} of different dimensions")
+            return args[0]
+        if name == "atan2":
+            if len(set(args)) > 1:
+                fail("atan2 of different dimensions")
+            return NONE
+        if any(arg != NONE for arg in args):
+            fail(f"{name} needs a plain number")
+        return NONE
+    fail(f"can not check the units of {ast.unparse(node)}")
+
+
+def check_formula(formula, input_units, output_units):
+    """Raise ValueError unless "<output> = <expression>" has the output's unit
+
+    input_units, output_units: {nickname: unit}. an input or output
+    without a unit is a plain number
+    """
+    target, _, expression = formula.partition("=")
+    target = target.strip()
+    dimensions = {name: parse_unit(unit)[1] for name, unit in input_units.items()}
+    found = _dimension(ast.parse(expression.strip(), mode="eval"), dimensions, formula)
+    if target not in output_units:
+        if found != NONE:
+            raise ValueError(
+                f"Formula {formula!r} gives {describe(found)}, but {target} has no unit"
+            )
+        return
+    expected = parse_unit(output_units[target])[1]
+    if found != expected:
+        raise ValueError(
+            f"Formula {formula!r} gives {describe(found)}, "
+            f"but {target} is in {output_units[target]} ({describe(expected)})"
+        )
@@ -0,0 +1,132 @@
+"""Batches of 3D vectors in one contiguous float64 buffer
+
+a Vector3 holds N vectors as an Nx3 array, with x, y and z as views into
+it, so a list of a million vectors is one allocation instead of a million
+rhino3dm objects. convert to and from rhino3dm only where the Hops
+protocol needs objects
+"""
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+rhino3dm = lazy_import("rhino3dm")
+
+
+class Vector3:
+    """N vectors (or points) as one Nx3 float64 array
+
+    works with NumPy: np.asarray(vectors) is the Nx3 buffer, no copy.
+    operators take another Vector3 of the same length (or of length 1),
+    an Nx3 array, or for * and / a number or N numbers
+    """
+
+    __slots__ = ("xyz",)
+
+    def __init__(self, xyz):
+        xyz = np.asarray(xyz, dtype=np.float64)
+        self.xyz = np.ascontiguousarray(xyz.reshape(-1, 3))
+
+    @classmethod
+    def zeros(cls, count):
+        return cls(np.zeros((count, 3)))
+
+    @classmethod
+    def between(cls, a, b):
+        """Vectors from points a to points b"""
+        return cls(_xyz(b) - _xyz(a))
+
+    @classmethod
+    def from_rhino(cls, objects):
+        """Vectors from rhino3dm Point3d/Vector3d objects (anything with X Y Z)"""
+        return cls([(o.X, o.Y, o.Z) for o in objects])
+
+    def to_rhino(self, kind="Vector3d"):
+        """rhino3dm Vector3d (or Point3d) objects, for the protocol boundary"""
+        make = getattr(rhino3dm, kind)
+        return [make(x, y, z) for x, y, z in self.xyz.tolist()]
+
+    @property
+    def x(self):
+        return self.xyz[:, 0]
+
+    @property
+    def y(self):
+        return self.xyz[:, 1]
+
+    @property
+    def z(self):
+        return self.xyz[:, 2]
+
+    def __len__(self):
+        return len(self.xyz)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.xyz if dtype is None else self.xyz.astype(dtype)
+
+    def __repr__(self):
+        return f"Vector3({len(self)} vectors)"
+
+    def __add__(self, other):
+        return Vector3(self.xyz + _xyz(other))
+
+    def __sub__(self, other):
+        return Vector3(self.xyz - _xyz(other))
+
+    def __iadd__(self, other):
+        self.xyz += _xyz(other)
+        return self
+
+    def __isub__(self, other):
+        self.xyz -= _xyz(other)
+        return self
+
+    def __neg__(self):
+        return Vector3(-self.xyz)
+
+    def __mul__(self, scale):
+        return Vector3(self.xyz * _scalars(scale))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scale):
+        return Vector3(self.xyz / _scalars(scale))
+
+    def norm(self):
+        """Length of every vector"""
+        return np.sqrt(np.einsum("ij,ij->i", self.xyz, self.xyz))
+
+    def normalize(self):
+        """Unit vectors, zero length vectors stay zero"""
+        norm = self.norm()
+        unit = np.zeros_like(self.xyz)
+        np.divide(self.xyz, norm[:, None], out=unit, where=norm[:, None] > 0)
+        return Vector3(unit)
+
+    def dot(self, other):
+        return np.einsum("ij,ij->i", *np.broadcast_arrays(self.xyz, _xyz(other)))
+
+    def cross(self, other):
+        return Vector3(np.cross(self.xyz, _xyz(other)))
+
+    def angle(self):
+        """Angle of every vector from the X axis in the XY plane, in radians
+
+        atan2, so the quadrant is right and X = 0 needs no special case
+        """
+        return np.arctan2(self.y, self.x)
+
+    def sum(self):
+        """The resultant of all vectors, as a Vector3 of one"""
+        return Vector3(self.xyz.sum(axis=0))
+
+
+def _xyz(value):
+    # the Nx3 buffer of a Vector3 or anything array like
+    if isinstance(value, Vector3):
+        return value.xyz
+    return np.asarray(value, dtype=np.float64).reshape(-1, 3)
+
+
+def _scalars(scale):
+    # a number, or one number per vector
+    scale = np.asarray(scale, dtype=np.float64)
+    return scale[:, None] if scale.ndim == 1 else scale